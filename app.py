@@ -1,48 +1,107 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, abort, send_file
-from models import Base, engine, SessionLocal, Trip, TripItem, Attraction, User, PackingItem
+import click
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, abort, send_file, g, current_app
+from flask import session as http_session
+from sqlalchemy import event, select, tuple_
+from models import engine, read_engine, SessionLocal, ReadSessionLocal, Trip, User, PackingItem
+from migrations import upgrade
 from seed_data import seed
-from itinerary import plan_itinerary
+from itinerary import create_planned_trip, load_itinerary, replan_trip
 import os
-from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from io import BytesIO
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from datetime import datetime
-
-app = Flask(__name__)
-app.secret_key = "dev-secret"  # for flash messages, should be a strong random key in production
-
-# Flask-Login setup
+import sys
+import base64
+import json
+from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
+from caching import LRUCache
+from catalog import catalog
+from exports import export_cache, export_queue, export_key, trip_info
+from batch import MAX_BATCH_TRIPS, create_trips
+from plan_cache import plan_cache
+from packing import PackingAccessError, add_suggested_items, apply_packing_changes
+from spatial import nearby
+import metrics
+from datetime import date, datetime, timezone
+
+# Flask-Login setup; bound to the app in create_app()
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+# (rule, view, options) registered on every app built by create_app()
+_routes = []
+
+def route(rule, **options):
+    def register(view):
+        _routes.append((rule, view, options))
+        return view
+    return register
+
+USER_CACHE_TTL = 300  # seconds a cached identity is trusted before re-reading users
+user_cache = LRUCache(maxsize=4096, ttl=USER_CACHE_TTL)
+
+# Rendered itinerary pages: trip_id -> ((revision, catalog version), html), bounded
+# by entry count and by total size. A trip has at most one entry; any write to it
+# bumps its revision, so a stale entry is never served and is replaced on the next view.
+PAGE_CACHE_SIZE = int(os.environ.get("TRIP_PAGE_CACHE_SIZE", "1024"))
+PAGE_CACHE_BYTES = int(os.environ.get("TRIP_PAGE_CACHE_BYTES", str(32 * 1024 * 1024)))
+page_cache = LRUCache(maxsize=PAGE_CACHE_SIZE, maxbytes=PAGE_CACHE_BYTES, sizeof=lambda entry: sys.getsizeof(entry[1]))
+
+class UserIdentity(UserMixin):
+    """What Flask-Login keeps as ``current_user``: the id and username, no ORM state."""
+    __slots__ = ("id", "username")
+
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+    def get_id(self):
+        return str(self.id)
+
 @login_manager.user_loader
 def load_user(user_id):
-    session = SessionLocal()
-    user = session.query(User).get(int(user_id))
-    session.close()
-    return user
-
-# Ensure DB exists and seed attractions
-with app.app_context():
-    Base.metadata.create_all(engine)
-    seed()
+    user_id = int(user_id)
+    identity = user_cache.get(user_id)
+    if identity is None:
+        row = get_read_session().execute(select(User.id, User.username).where(User.id == user_id)).first()
+        if row is None:
+            return None
+        identity = UserIdentity(*row)
+        user_cache.set(user_id, identity)
+    return identity
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _forget_cached_user(mapper, connection, target):
+    # Covers password changes (set_password + commit) and account removal.
+    user_cache.pop(target.id)
 
 def get_session():
-    return SessionLocal()
+    """The request's read/write session, opened on first use and closed at teardown."""
+    if "db_session" not in g:
+        g.db_session = SessionLocal()
+    return g.db_session
+
+def get_read_session():
+    """Session for read-only routes; uses the read engine when one is configured."""
+    if ReadSessionLocal is SessionLocal:
+        return get_session()
+    if "db_read_session" not in g:
+        g.db_read_session = ReadSessionLocal()
+    return g.db_read_session
+
+def close_sessions(exc):
+    for name in ("db_session", "db_read_session"):
+        session = g.pop(name, None)
+        if session is not None:
+            session.close()
 
-@app.route("/about")
+@route("/about")
 def about():
     return render_template("about.html")
 
-@app.route("/")
+@route("/")
 def index():
     return render_template("index.html")
 
-@app.route("/signup", methods=["GET", "POST"])
+@route("/signup", methods=["GET", "POST"])
 def signup():
     if request.method == "POST":
         username = request.form.get("username")
@@ -51,7 +110,6 @@ def signup():
         existing_user = session.query(User).filter_by(username=username).first()
         if existing_user:
             flash("Username already exists. Please choose a different one.")
-            session.close()
             return redirect(url_for('signup'))
         
         new_user = User(username=username)
@@ -60,18 +118,16 @@ def signup():
         session.commit()
         login_user(new_user)
         flash("Account created and logged in successfully!")
-        session.close()
         return redirect(url_for('trips'))
     return render_template("signup.html")
 
-@app.route("/login", methods=["GET", "POST"])
+@route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
         username = request.form.get("username")
         password = request.form.get("password")
         session = get_session()
         user = session.query(User).filter_by(username=username).first()
-        session.close()
         if user and user.check_password(password):
             login_user(user)
             flash("Logged in successfully!")
@@ -80,28 +136,124 @@ def login():
             flash("Invalid username or password.")
     return render_template("login.html")
 
-@app.route("/logout")
+@route("/logout")
 @login_required
 def logout():
+    user_cache.pop(current_user.id)
     logout_user()
     flash("You have been logged out.")
     return redirect(url_for('index'))
 
-@app.route("/trips")
+TRIPS_PAGE_SIZE = 20
+TRIPS_MAX_PAGE_SIZE = 100
+# Only the columns the listing shows; no ORM objects are built for a page.
+TRIP_LIST_COLUMNS = (Trip.id, Trip.name, Trip.city, Trip.start_date, Trip.days, Trip.interests, Trip.budget)
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+def decode_cursor(token, dated=False):
+    """Return the key a page starts after, or None for the first page; 400 on a bad token.
+
+    The key is ``{"id": ...}``, plus the ``start_date`` of that trip if ``dated``.
+    """
+    if not token:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        after = {"id": int(key["id"])}
+        if dated:
+            after["start_date"] = str(key["start_date"])
+        return after
+    except (ValueError, KeyError, TypeError):
+        abort(400, "Invalid cursor")
+
+def trips_page(session, user_id, cursor=None, limit=TRIPS_PAGE_SIZE, city=None, when=None):
+    """One keyset page of a user's trips: ``(rows, next_cursor)``.
+
+    Trips come newest first, seeking on ``id < cursor`` along the
+    (user_id[, city]) index, so a page costs the same however many trips the
+    user has. With ``when``, upcoming trips come soonest first and past trips
+    latest first, seeking on (start_date, id) along the (user_id, start_date,
+    id) index.
+    """
+    query = select(*TRIP_LIST_COLUMNS).where(Trip.user_id == user_id)
+    if city:
+        query = query.where(Trip.city == city)
+    dated = when in ("upcoming", "past")
+    after = decode_cursor(cursor, dated)
+    if dated:
+        today = date.today().isoformat()  # start_date is stored as YYYY-MM-DD, so strings compare as dates
+        key = tuple_(Trip.start_date, Trip.id)
+        if when == "upcoming":
+            query = query.where(Trip.start_date >= today).order_by(Trip.start_date, Trip.id)
+            if after is not None:
+                query = query.where(key > (after["start_date"], after["id"]))
+        else:
+            query = query.where(Trip.start_date < today).order_by(Trip.start_date.desc(), Trip.id.desc())
+            if after is not None:
+                query = query.where(key < (after["start_date"], after["id"]))
+    else:
+        query = query.order_by(Trip.id.desc())
+        if after is not None:
+            query = query.where(Trip.id < after["id"])
+    rows = session.execute(query.limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor({"id": last.id, "start_date": last.start_date} if dated else {"id": last.id})
+    return rows[:limit], next_cursor
+
+def _page_args():
+    limit = min(max(request.args.get("limit", TRIPS_PAGE_SIZE, type=int), 1), TRIPS_MAX_PAGE_SIZE)
+    return dict(cursor=request.args.get("cursor"), limit=limit,
+                city=request.args.get("city") or None, when=request.args.get("when") or None)
+
+@route("/trips")
 @login_required
 def trips():
-    session = get_session()
-    trips = session.query(Trip).filter_by(user_id=current_user.id).order_by(Trip.id.desc()).all()
-    session.close()
+    # trips.html has no next-page link, so the page lists every trip; /api/trips pages through them.
+    trips = get_read_session().execute(select(*TRIP_LIST_COLUMNS).where(Trip.user_id == current_user.id)
+                                       .order_by(Trip.id.desc())).all()
     return render_template("trips.html", trips=trips)
 
-
-@app.route("/create_trip", methods=["GET"])
+@route("/api/trips")
+@login_required
+def api_trips():
+    trips, next_cursor = trips_page(get_read_session(), current_user.id, **_page_args())
+    return jsonify({"trips": [row._asdict() for row in trips], "next_cursor": next_cursor})
+
+NEARBY_DEFAULT_RADIUS_KM = 2.0
+NEARBY_MAX_RADIUS_KM = 50.0
+NEARBY_MAX_RESULTS = 100
+
+@route("/api/attractions/nearby")
+def api_nearby_attractions():
+    """Attractions of ``city`` near ``lat``/``lon``, nearest first.
+
+    Optional ``radius_km`` (default 2, max 50), ``k`` (default 20, max 100)
+    and ``category`` (repeatable or comma separated).
+    """
+    city = " ".join(request.args.get("city", "").split())
+    lat = request.args.get("lat", type=float)
+    lon = request.args.get("lon", type=float)
+    if not city or lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        abort(400, "city, lat and lon are required")
+    radius_km = min(max(request.args.get("radius_km", NEARBY_DEFAULT_RADIUS_KM, type=float), 0.0), NEARBY_MAX_RADIUS_KM)
+    k = min(max(request.args.get("k", 20, type=int), 1), NEARBY_MAX_RESULTS)
+    categories = [c.strip() for value in request.args.getlist("category") for c in value.split(",") if c.strip()]
+    results = nearby(city, lat, lon, radius_km, k, categories)
+    return jsonify({"attractions": [
+        {"id": a.id, "name": a.name, "category": a.category, "duration_hours": a.duration_hours,
+         "lat": a.lat, "lon": a.lon, "image_path": a.image_path, "distance_km": round(km, 3)}
+        for a, km in results]})
+
+@route("/create_trip", methods=["GET"])
 @login_required
 def create_trip_form():
     return render_template("create_trip.html")
 
-@app.route("/plan", methods=["POST"])
+@route("/plan", methods=["POST"])
 @login_required
 def plan():
     name = request.form.get("name", "My Trip")
@@ -113,174 +265,317 @@ def plan():
     budget = float(request.form.get("budget", 0.0)) # Get budget from form
 
     session = get_session()
-    try:
-        trip = Trip(name=name, city=city, start_date=start_date, days=days, interests=interests_csv, user_id=current_user.id, budget=budget)
-        session.add(trip)
-        session.commit()
+    trip = create_planned_trip(session, name=name, city=city, start_date=start_date, days=days,
+                               interests_csv=interests_csv, user_id=current_user.id, budget=budget)
 
-        plan_itinerary(city=city, start_date=start_date, days=days, interests_csv=interests_csv, trip_id=trip.id)
+    flash("Trip created successfully!")
+    return redirect(url_for("view_trip", trip_id=trip.id))
 
-        flash("Trip created successfully!")
-        return redirect(url_for("view_trip", trip_id=trip.id))
-    finally:
-        session.close()
-
-@app.route("/trip/<int:trip_id>")
+@route("/api/plan/batch", methods=["POST"])
+@login_required
+def api_plan_batch():
+    """Plan and store many trips at once.
+
+    Takes ``{"trips": [spec, ...]}`` (or a bare list) of up to
+    ``MAX_BATCH_TRIPS`` specs with ``name``, ``city``, ``start_date``, ``days``,
+    ``interests`` and ``budget``. Returns a status per spec and the batch throughput.
+    """
+    data = request.get_json(silent=True)
+    specs = data.get("trips") if isinstance(data, dict) else data
+    if not isinstance(specs, list) or not specs:
+        return jsonify({"success": False, "message": "Expected a non-empty list of trips"}), 400
+    if len(specs) > MAX_BATCH_TRIPS:
+        return jsonify({"success": False, "message": f"At most {MAX_BATCH_TRIPS} trips per batch"}), 413
+    result = create_trips(get_session(), current_user.id, specs)
+    return jsonify(dict(result, success=result["created"] > 0)), 201 if result["created"] else 400
+
+@route("/trip/<int:trip_id>")
 @login_required
 def view_trip(trip_id):
+    """The itinerary page, revalidated and cached by trip revision.
+
+    One small query reads the revision first. A matching If-None-Match (or a
+    recent enough If-Modified-Since) gets a 304 without loading the itinerary;
+    otherwise the page comes from ``page_cache`` when it holds this revision,
+    and is rendered and stored when it does not. Requests with pending flash
+    messages are always rendered, since the message is part of the page.
+    """
+    session = get_read_session()
+    state = session.execute(select(Trip.revision, Trip.updated_at)
+                            .where(Trip.id == trip_id, Trip.user_id == current_user.id)).first()
+    if not state:
+        abort(404)
+    tag = (state.revision, catalog.version())
+    etag = f"trip-{trip_id}-{tag[0]}-{tag[1]}-{current_app.config['TEMPLATE_STAMP']}"
+    last_modified = state.updated_at.replace(tzinfo=timezone.utc) if state.updated_at else None
+    cacheable = "_flashes" not in http_session
+
+    if cacheable and _not_modified(etag, last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        cached = page_cache.get(trip_id) if cacheable else None
+        if cached is not None and cached[0] == tag:
+            html = cached[1]
+        else:
+            html = _render_itinerary(session, trip_id)
+            if cacheable:
+                page_cache.set(trip_id, (tag, html))
+        response = current_app.response_class(html)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True  # always revalidate; the 304 is cheap
+    return response
+
+def _not_modified(etag, last_modified):
+    """Whether the request's validators match; If-None-Match takes precedence (RFC 9110)."""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    return bool(since and last_modified and last_modified.replace(microsecond=0) <= since)
+
+def _render_itinerary(session, trip_id):
+    trip, days, packing_items = load_itinerary(session, trip_id, current_user.id)
+    if not trip:
+        abort(404)
+
+    # Dummy cost estimation (can be more sophisticated)
+    food_cost_per_day = 500
+    travel_cost_per_day = 1000
+    entry_cost_per_day = 300
+    estimated_cost_per_day = food_cost_per_day + travel_cost_per_day + entry_cost_per_day
+    total_estimated_cost = estimated_cost_per_day * trip.days
+
+    budget_remaining = trip.budget - total_estimated_cost
+    budget_percentage_used = (total_estimated_cost / trip.budget) * 100 if trip.budget > 0 else 0
+    budget_percentage_used = min(100, max(0, budget_percentage_used)) # Cap between 0 and 100
+
+    return render_template("itinerary.html", trip=trip, days=days, packing_items=packing_items,
+                           estimated_cost_per_day=estimated_cost_per_day, total_estimated_cost=total_estimated_cost,
+                           budget_remaining=budget_remaining, budget_percentage_used=budget_percentage_used)
+
+def _optional_int(form, name):
+    """``form[name]`` as an int, or None when absent (or an empty form field); 0 is a value, not absent."""
+    value = form.get(name)
+    return None if value is None or value == "" else int(value)
+
+@route("/trip/<int:trip_id>/edit", methods=["POST"])
+@login_required
+def edit_trip(trip_id):
+    """Change days, interests or start date, or pin/remove one attraction.
+
+    Accepts a form or a JSON body; omitted fields keep their current value.
+    Only the days the change touches are re-planned.
+    """
     session = get_session()
+    trip = session.query(Trip).filter_by(id=trip_id, user_id=current_user.id).first()
+    if not trip:
+        abort(404)
+    data = request.get_json(silent=True) if request.is_json else None
+    if request.is_json and not isinstance(data, dict):
+        return jsonify({"success": False, "message": "Expected a JSON object"}), 400
+    form = request.form if data is None else data
+    interests = None
+    if data is not None and "interests" in data:
+        interests = data["interests"] if isinstance(data["interests"], list) else str(data["interests"]).split(",")
+    elif data is None and "interests" in request.form:
+        interests = request.form.getlist("interests")
     try:
-        trip = session.query(Trip).filter_by(id=trip_id, user_id=current_user.id).first()
-        if not trip:
-            abort(404)
-        items = session.query(TripItem).filter(TripItem.trip_id==trip_id).order_by(TripItem.day, TripItem.order_index).all()
-        packing_items = session.query(PackingItem).filter_by(trip_id=trip_id).all() # Fetch packing items
-
-        # Dummy cost estimation (can be more sophisticated)
-        food_cost_per_day = 500
-        travel_cost_per_day = 1000
-        entry_cost_per_day = 300
-        estimated_cost_per_day = food_cost_per_day + travel_cost_per_day + entry_cost_per_day
-        total_estimated_cost = estimated_cost_per_day * trip.days
-
-        budget_remaining = trip.budget - total_estimated_cost
-        budget_percentage_used = (total_estimated_cost / trip.budget) * 100 if trip.budget > 0 else 0
-        budget_percentage_used = min(100, max(0, budget_percentage_used)) # Cap between 0 and 100
-
-        # Build day-wise structure and map points
-        days = {}
-        for it in items:
-            a = session.get(Attraction, it.attraction_id)
-            days.setdefault(it.day, []).append({
-                "name": a.name,
-                "lat": a.lat,
-                "lon": a.lon,
-                "start": it.start_time,
-                "end": it.end_time,
-                "category": a.category,
-                "duration": a.duration_hours
-            })
-        return render_template("itinerary.html", trip=trip, days=days, packing_items=packing_items,
-                               estimated_cost_per_day=estimated_cost_per_day, total_estimated_cost=total_estimated_cost,
-                               budget_remaining=budget_remaining, budget_percentage_used=budget_percentage_used)
-    finally:
-        session.close()
-
-@app.route("/add_packing_item/<int:trip_id>", methods=["POST"])
+        days = _optional_int(form, "days")
+        pin = None
+        if _optional_int(form, "pin_attraction_id") is not None:
+            pin_day = _optional_int(form, "pin_day")
+            pin = (_optional_int(form, "pin_attraction_id"), 1 if pin_day is None else pin_day)
+        remove = _optional_int(form, "remove_attraction_id")
+        stats = replan_trip(session, trip, days=days,
+                            interests_csv=",".join(i for i in interests if i) if interests is not None else None,
+                            start_date=form.get("start_date") or None, pin=pin, remove=remove)
+    except (TypeError, ValueError) as exc:
+        if request.is_json:
+            return jsonify({"success": False, "message": str(exc)}), 400
+        flash(f"Could not update trip: {exc}")
+        return redirect(url_for("view_trip", trip_id=trip_id))
+
+    if request.is_json:
+        return jsonify(dict(stats, success=True))
+    flash("Trip updated!")
+    return redirect(url_for("view_trip", trip_id=trip_id))
+
+@route("/add_packing_item/<int:trip_id>", methods=["POST"])
 @login_required
 def add_packing_item(trip_id):
     session = get_session()
-    try:
-        trip = session.query(Trip).filter_by(id=trip_id, user_id=current_user.id).first()
-        if not trip:
-            abort(404)
-        item_name = request.form.get("item_name")
-        if item_name:
-            new_item = PackingItem(trip_id=trip.id, item_name=item_name)
-            session.add(new_item)
-            session.commit()
-            flash("Packing item added!")
-        return redirect(url_for('view_trip', trip_id=trip.id))
-    finally:
-        session.close()
-
-@app.route("/toggle_packing_item/<int:item_id>", methods=["POST"])
+    trip = session.query(Trip).filter_by(id=trip_id, user_id=current_user.id).first()
+    if not trip:
+        abort(404)
+    item_name = request.form.get("item_name")
+    if item_name:
+        new_item = PackingItem(trip_id=trip.id, item_name=item_name)
+        session.add(new_item)
+        session.commit()
+        flash("Packing item added!")
+    return redirect(url_for('view_trip', trip_id=trip.id))
+
+@route("/toggle_packing_item/<int:item_id>", methods=["POST"])
 @login_required
 def toggle_packing_item(item_id):
     session = get_session()
+    # The owner comes back in the same query, so checking it needs no lazy load of item.trip
+    row = session.execute(select(PackingItem, Trip.user_id).join(PackingItem.trip)
+                          .where(PackingItem.id == item_id)).first()
+    if not row:
+        abort(404)
+    item, owner_id = row
+    # Ensure the item belongs to the current user's trip
+    if owner_id != current_user.id:
+        return jsonify({"success": False, "message": "Unauthorized"}), 403
+
+    is_packed = item.is_packed = not item.is_packed
+    session.commit()  # reading item.is_packed after this would reload the expired row
+    return jsonify({"success": True, "is_packed": is_packed})
+
+@route("/trip/<int:trip_id>/packing", methods=["POST"])
+@login_required
+def update_packing_list(trip_id):
+    """Apply many checklist edits at once.
+
+    JSON body: ``{"toggle": [ids], "packed": {id: bool}, "add": [names], "delete": [ids]}``,
+    all optional. Everything is applied in one transaction or not at all.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        abort(400, "Expected a JSON object")
     try:
-        item = session.query(PackingItem).filter_by(id=item_id).first()
-        if not item:
-            abort(404)
-        # Ensure the item belongs to the current user's trip
-        if item.trip.user_id != current_user.id:
-            return jsonify({"success": False, "message": "Unauthorized"}), 403
-
-        item.is_packed = not item.is_packed
-        session.commit()
-        return jsonify({"success": True, "is_packed": item.is_packed})
-    finally:
-        session.close()
-
-@app.route("/delete/<int:trip_id>", methods=["POST"])
+        result = apply_packing_changes(get_session(), trip_id, current_user.id,
+                                       toggle=data.get("toggle") or (), packed=data.get("packed") or {},
+                                       add=data.get("add") or (), remove=data.get("delete") or ())
+    except PackingAccessError as exc:
+        return jsonify({"success": False, "message": str(exc)}), 404
+    except (TypeError, ValueError, AttributeError):
+        return jsonify({"success": False, "message": "Malformed packing update"}), 400
+    return jsonify(dict(result, success=True))
+
+@route("/trip/<int:trip_id>/packing/suggest", methods=["POST"])
+@login_required
+def suggest_packing_list(trip_id):
+    """Add suggested items (by trip length and attraction categories) the list does not have yet."""
+    session = get_session()
+    trip = session.query(Trip).filter_by(id=trip_id, user_id=current_user.id).first()
+    if not trip:
+        abort(404)
+    added = add_suggested_items(session, trip)
+    if request.is_json:
+        return jsonify({"success": True, "added": added})
+    flash(f"Added {added} suggested packing items." if added else "Your packing list already has every suggestion.")
+    return redirect(url_for('view_trip', trip_id=trip_id))
+
+@route("/delete/<int:trip_id>", methods=["POST"])
 @login_required
 def delete_trip(trip_id):
     session = get_session()
-    try:
-        trip_to_delete = session.query(Trip).filter_by(id=trip_id, user_id=current_user.id).first()
-        if not trip_to_delete:
-            abort(404)
-        session.query(TripItem).filter(TripItem.trip_id==trip_to_delete.id).delete()
-        session.query(PackingItem).filter(PackingItem.trip_id==trip_to_delete.id).delete() # Delete associated packing items
-        session.delete(trip_to_delete)
-        session.commit()
-        flash("Trip deleted.")
-        return redirect(url_for("trips"))
-    finally:
-        session.close()
-
-@app.route("/download_itinerary/<int:trip_id>")
+    # Items and packing items go with it through ON DELETE CASCADE
+    deleted = session.query(Trip).filter_by(id=trip_id, user_id=current_user.id).delete(synchronize_session=False)
+    if not deleted:
+        abort(404)
+    session.commit()
+    page_cache.pop(trip_id)
+    flash("Trip deleted.")
+    return redirect(url_for("trips"))
+
+def _send_export(path, key, filename):
+    return send_file(path, mimetype='application/pdf', as_attachment=True, download_name=filename,
+                     etag=key, conditional=True, max_age=0)
+
+@route("/download_itinerary/<int:trip_id>")
 @login_required
 def download_itinerary(trip_id):
-    session = get_session()
-    try:
-        trip = session.query(Trip).filter_by(id=trip_id, user_id=current_user.id).first()
-        if not trip:
-            abort(404)
-        items = session.query(TripItem).filter(TripItem.trip_id==trip_id).order_by(TripItem.day, TripItem.order_index).all()
-
-        # Build day-wise structure for PDF
-        days_data = {}
-        for it in items:
-            a = session.get(Attraction, it.attraction_id)
-            days_data.setdefault(it.day, []).append({
-                "name": a.name,
-                "category": a.category,
-                "start": it.start_time,
-                "end": it.end_time,
-                "duration": a.duration_hours
-            })
-
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, rightMargin=inch/2, leftMargin=inch/2, topMargin=inch/2, bottomMargin=inch/2)
-        styles = getSampleStyleSheet()
-        story = []
-
-        # Title
-        story.append(Paragraph(f"Trip Itinerary: {trip.name}", styles['h1']))
-        story.append(Spacer(1, 0.2 * inch))
-
-        # Trip Details
-        story.append(Paragraph(f"City: {trip.city}", styles['h3']))
-        story.append(Paragraph(f"Start Date: {trip.start_date}", styles['h3']))
-        story.append(Paragraph(f"Days: {trip.days}", styles['h3']))
-        story.append(Paragraph(f"Interests: {trip.interests or '—'}", styles['h3']))
-        story.append(Spacer(1, 0.4 * inch))
-
-        # Day-wise Itinerary
-        for day_num in sorted(days_data.keys()):
-            story.append(Paragraph(f"Day {day_num}", styles['h2']))
-            story.append(Spacer(1, 0.1 * inch))
-            if days_data[day_num]:
-                for item in days_data[day_num]:
-                    story.append(Paragraph(f"- {item['name']} ({item['start']} - {item['end']}) - {item['category']} ({item['duration']:.1f}h)", styles['Normal']))
-                story.append(Spacer(1, 0.2 * inch))
-            else:
-                story.append(Paragraph("No activities planned for this day.", styles['Normal']))
-                story.append(Spacer(1, 0.2 * inch))
-            story.append(PageBreak())
-
-        # Map Placeholder
-        story.append(Paragraph("Map Snapshot: [Map visualization would go here]", styles['h2']))
-        story.append(Paragraph("Due to limitations, a dynamic map snapshot cannot be generated in the PDF. Please refer to the web application for interactive maps.", styles['Normal']))
-        story.append(Spacer(1, 0.2 * inch))
-
-        doc.build(story)
-        buffer.seek(0)
-
-        return send_file(buffer, mimetype='application/pdf', as_attachment=True, download_name=f'{trip.name}_itinerary.pdf')
-    finally:
-        session.close()
+    session = get_read_session()
+    trip, days_data, _ = load_itinerary(session, trip_id, current_user.id)
+    if not trip:
+        abort(404)
+    info = trip_info(trip)
+
+    # The key is a hash of everything in the PDF, so a matching ETag means the client copy is current.
+    key = export_key(info, days_data)
+    if key in request.if_none_match:
+        response = current_app.response_class(status=304)
+        response.set_etag(key)
+        return response
+    path = export_cache.render(key, info, days_data)
+    return _send_export(path, key, f'{info["name"]}_itinerary.pdf')
+
+@route("/export/<int:trip_id>", methods=["POST"])
+@login_required
+def enqueue_export(trip_id):
+    session = get_read_session()
+    trip, days_data, _ = load_itinerary(session, trip_id, current_user.id)
+    if not trip:
+        abort(404)
+    info = trip_info(trip)
+
+    job = export_queue.submit(current_user.id, info, days_data)
+    return jsonify(dict(job.to_dict(), status_url=url_for("export_status", job_id=job.id),
+                        download_url=url_for("export_download", job_id=job.id))), 202
+
+@route("/export/jobs/<job_id>")
+@login_required
+def export_status(job_id):
+    job = export_queue.get(job_id, current_user.id)
+    if not job:
+        abort(404)
+    return jsonify(job.to_dict())
+
+@route("/export/jobs/<job_id>/download")
+@login_required
+def export_download(job_id):
+    job = export_queue.get(job_id, current_user.id)
+    if not job:
+        abort(404)
+    if job.status != "done":
+        return jsonify(job.to_dict()), 409
+    path = export_cache.get(job.key)
+    if not path:
+        abort(410)  # evicted from the cache since the job finished; enqueue again
+    return _send_export(path, job.key, job.filename)
+
+@click.command("init-db")
+def init_db_command():
+    """Create the database or upgrade it to the latest schema."""
+    click.echo(f"Database schema at version {upgrade(engine)}.")
+
+@click.command("seed")
+def seed_command():
+    """Upsert the curated attractions."""
+    click.echo(json.dumps(seed().to_dict()))
+
+def _template_stamp(app):
+    """Newest template modification time, in hex; part of page ETags so new templates invalidate them."""
+    folder = os.path.join(app.root_path, app.template_folder)
+    mtimes = [os.path.getmtime(os.path.join(root, name)) for root, _, names in os.walk(folder) for name in names]
+    return format(int(max(mtimes, default=0)), "x")
+
+def create_app(config=None):
+    """Build the Flask app.
+
+    Touches no database: run ``flask --app app init-db`` and ``flask --app app
+    seed`` once per deployment instead of in every worker.
+    """
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("TRIP_SECRET_KEY", "dev-secret")  # for flash messages, should be a strong random key in production
+    app.config.update(config or {})
+    app.config.setdefault("TEMPLATE_STAMP", _template_stamp(app))
+    for rule, view, options in _routes:
+        app.add_url_rule(rule, view_func=view, **options)
+    app.teardown_appcontext(close_sessions)
+    login_manager.init_app(app)
+    # No-op unless TRIP_METRICS=1.
+    metrics.init_app(app, [engine, read_engine], caches={"catalog": catalog.stats, "plan": plan_cache.stats})
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(seed_command)
+    return app
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Development server: bring the local database up to date, then serve.
+    upgrade(engine)
+    seed()
+    create_app().run(debug=True)
@@ -0,0 +1,273 @@
+"""Batch trip planning on a process pool.
+
+``create_trips`` takes many trip specs (``name``, ``city``, ``start_date``,
+``days``, ``interests`` and an optional ``budget``), validates them, and plans
+each distinct (city, days, interests) once. Plans already in ``plan_cache``
+are reused; the rest are solved in parallel by worker processes. Workers get
+a read-only snapshot of the catalog for the cities involved (attraction
+records, distance matrix, center) through the pool initializer, so they
+never query the database. Web requests start the pool from a forkserver and
+pickle the snapshot once per worker; the single-threaded CLI forks and
+shares it copy-on-write. All trips, their items and their suggested packing
+lists are then written in one transaction, and the result lists a status for
+every spec.
+
+Usage:
+    python batch.py specs.jsonl --user USERNAME [--workers 4] [--solver greedy|improve]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+
+import metrics
+from catalog import catalog
+from itinerary import CITY_CENTERS, _normalize, filter_attractions, get_distance_matrix, get_solver, timed_items
+from models import SessionLocal, engine, read_engine, PackingItem, Trip, TripItem, User
+from packing import packing_rows, suggest_packing_items
+from plan_cache import plan_cache
+
+MAX_BATCH_TRIPS = int(os.environ.get("TRIP_BATCH_MAX_TRIPS", "200"))
+BATCH_WORKERS = int(os.environ.get("TRIP_BATCH_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+# Below this many plans to compute, a pool costs more to start than it saves.
+PARALLEL_MIN_PLANS = int(os.environ.get("TRIP_BATCH_PARALLEL_MIN_PLANS", "4"))
+MAX_TRIP_DAYS = 30
+# Web workers run other threads (PDF exports) and hold cache locks; a child forked from
+# such a process can inherit a lock some other thread held and deadlock. The pool is
+# therefore started from a clean forkserver by default. Only the CLI forks directly.
+POOL_START_METHOD = "forkserver"
+
+BatchKey = Tuple[str, int, Tuple[str, ...]]  # (city, days, interests), as normalized for plan_cache
+
+def validate_spec(raw) -> Dict[str, Any]:
+    """Check and normalize one trip spec; raise ValueError if unusable."""
+    if not isinstance(raw, dict):
+        raise ValueError("trip spec is not an object")
+    name = str(raw.get("name") or "My Trip").strip()
+    if len(name) > 80:
+        raise ValueError("name longer than 80 characters")
+    interests = raw.get("interests") or []
+    if isinstance(interests, str):
+        interests = interests.split(",")
+    if not isinstance(interests, list):
+        raise ValueError("interests must be a list or a comma separated string")
+    city, interests = _normalize(str(raw.get("city") or ""), ",".join(str(i) for i in interests))
+    if not city or len(city) > 40:
+        raise ValueError("city must be 1-40 characters")
+    start_date = str(raw.get("start_date") or "")
+    try:
+        datetime.strptime(start_date, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"start_date must be YYYY-MM-DD, got {start_date!r}") from None
+    try:
+        days = int(raw.get("days"))
+        budget = float(raw.get("budget") or 0.0)
+    except (TypeError, ValueError):
+        raise ValueError("days and budget must be numbers") from None
+    if not 1 <= days <= MAX_TRIP_DAYS:
+        raise ValueError(f"days must be 1-{MAX_TRIP_DAYS}")
+    if budget < 0:
+        raise ValueError("budget must not be negative")
+    return {"name": name, "city": city, "start_date": start_date, "days": days,
+            "interests": ",".join(interests), "budget": budget, "key": (city, days, tuple(interests))}
+
+# Worker side: city -> (attractions, DistanceMatrix, center or None), set once per process.
+_shared: Dict[str, tuple] = {}
+
+def _init_worker(snapshot):
+    global _shared
+    _shared = snapshot
+    # Pooled connections inherited through fork belong to the parent; drop them unused.
+    # (Under forkserver there are none and this is a no-op.)
+    engine.dispose(close=False)
+    read_engine.dispose(close=False)
+
+def _plan(entry, days: int, interests: Tuple[str, ...], solver_name: str) -> List[List[int]]:
+    """Attraction ids per day; pure computation on a catalog snapshot entry."""
+    attractions, matrix, center = entry
+    candidates = filter_attractions(attractions, list(interests))
+    if not candidates:
+        return []
+    center = center or (candidates[0].lat, candidates[0].lon)  # as city_center() falls back
+    schedule = get_solver(solver_name).solve(matrix, candidates, center, days)
+    return [[a.id for a in day_items] for day_items in schedule]
+
+def _plan_shared(key: BatchKey, solver_name: str) -> List[List[int]]:
+    city, days, interests = key
+    return _plan(_shared[city], days, interests, solver_name)
+
+def _pool_context(start_method: str):
+    # Imported here so web workers that never run a batch do not pay for multiprocessing at startup.
+    import multiprocessing
+    if start_method not in multiprocessing.get_all_start_methods():
+        start_method = "spawn"
+    context = multiprocessing.get_context(start_method)
+    if start_method == "forkserver":
+        # Workers fork from a server that already imported the planner, not from this process.
+        context.set_forkserver_preload(["batch"])
+    return context
+
+def plan_batch(keys: Iterable[BatchKey], workers: int = BATCH_WORKERS, solver=None,
+               start_method: str = POOL_START_METHOD) -> Dict[str, Any]:
+    """Plan every distinct key; ``plans`` maps each to its day-by-day ids, or to the exception it raised.
+
+    Cached plans are reused. The rest run on up to ``workers`` processes
+    started with ``start_method``, or in this process when there are fewer
+    than ``PARALLEL_MIN_PLANS`` of them. Pass ``"fork"`` only from a
+    single-threaded process.
+    """
+    route_solver = get_solver(solver)
+    keys = list(dict.fromkeys(keys))
+    # Each city's records with the catalog version they come from; plans and matrices are keyed on it.
+    cities = {city: catalog.city_snapshot(city) for city in dict.fromkeys(key[0] for key in keys)}
+    plans: Dict[BatchKey, Any] = {}
+    todo = []
+    for key in keys:
+        city, days, interests = key
+        cached = plan_cache.get((city, days, interests, cities[city][0], route_solver.name))
+        if cached is not None:
+            plans[key] = cached
+        else:
+            todo.append(key)
+
+    snapshot = {}
+    for city in dict.fromkeys(key[0] for key in todo):
+        version, attractions = cities[city]
+        matrix = get_distance_matrix(city, attractions, version) if attractions else None
+        snapshot[city] = (attractions, matrix, CITY_CENTERS.get(city) or catalog.center(city))
+
+    workers = min(workers, len(todo))
+    if workers > 1 and len(todo) >= PARALLEL_MIN_PLANS:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context(start_method),
+                                 initializer=_init_worker, initargs=(snapshot,)) as pool:
+            futures = {pool.submit(_plan_shared, key, route_solver.name): key for key in todo}
+            for future in as_completed(futures):
+                try:
+                    plans[futures[future]] = future.result()
+                except Exception as exc:
+                    plans[futures[future]] = exc
+    else:
+        workers = 1 if todo else 0
+        for key in todo:
+            city, days, interests = key
+            try:
+                plans[key] = _plan(snapshot[city], days, interests, route_solver.name)
+            except Exception as exc:
+                plans[key] = exc
+
+    for key in todo:
+        if not isinstance(plans[key], Exception):
+            city, days, interests = key
+            plan_cache.set((city, days, interests, cities[city][0], route_solver.name), plans[key])
+    return {"plans": plans, "computed": len(todo), "workers": workers}
+
+def create_trips(session, user_id: int, raw_specs: List[Any], workers: int = BATCH_WORKERS, solver=None,
+                 packing_list: bool = True, start_method: str = POOL_START_METHOD) -> Dict[str, Any]:
+    """Validate, plan and store a batch of trips for ``user_id``.
+
+    Invalid specs and failed plans are reported and skipped; everything else
+    is inserted in one transaction (one multi-row INSERT per table). Returns
+    a per-spec ``trips`` list (``created`` with ``trip_id`` and ``items``, or
+    ``invalid``/``failed`` with ``error``) and the batch timings and throughput.
+    """
+    started = time.perf_counter()
+    results: List[Optional[Dict[str, Any]]] = [None] * len(raw_specs)
+    specs = {}
+    for i, raw in enumerate(raw_specs):
+        try:
+            specs[i] = validate_spec(raw)
+        except ValueError as exc:
+            results[i] = {"index": i, "status": "invalid", "error": str(exc)}
+
+    with metrics.timer("plan_batch"):
+        batch = plan_batch((spec["key"] for spec in specs.values()), workers, solver, start_method)
+    planned_at = time.perf_counter()
+
+    planned = []
+    for i, spec in specs.items():
+        plan = batch["plans"][spec["key"]]
+        if isinstance(plan, Exception):
+            results[i] = {"index": i, "status": "failed", "error": f"{type(plan).__name__}: {plan}"}
+        else:
+            planned.append((i, spec, plan))
+
+    if planned:
+        by_id = catalog.get_many(aid for _, _, plan in planned for day_ids in plan for aid in day_ids)
+        try:
+            trip_ids = session.scalars(
+                insert(Trip).returning(Trip.id, sort_by_parameter_order=True),
+                [{"name": spec["name"], "city": spec["city"], "start_date": spec["start_date"], "days": spec["days"],
+                  "interests": spec["interests"], "budget": spec["budget"], "user_id": user_id}
+                 for _, spec, _ in planned]).all()
+            items, packing = [], []
+            for (i, spec, plan), trip_id in zip(planned, trip_ids):
+                schedule = [[by_id[aid] for aid in day_ids] for day_ids in plan]
+                rows = timed_items(schedule, spec["start_date"])
+                items += [dict(row, trip_id=trip_id) for row in rows]
+                if packing_list:
+                    categories = {a.category for day_items in schedule for a in day_items}
+                    packing += packing_rows(trip_id, suggest_packing_items(spec["days"], categories))
+                results[i] = {"index": i, "status": "created", "trip_id": trip_id, "items": len(rows)}
+            if items:
+                session.execute(insert(TripItem), items)
+            if packing:
+                session.execute(insert(PackingItem), packing)
+            session.commit()
+        except BaseException:
+            session.rollback()
+            raise
+
+    finished = time.perf_counter()
+    created = len(planned)
+    return {"trips": results, "created": created, "failed": sum(r["status"] == "failed" for r in results),
+            "invalid": len(raw_specs) - len(specs), "plans_computed": batch["computed"], "workers": batch["workers"],
+            "plan_seconds": round(planned_at - started, 4), "persist_seconds": round(finished - planned_at, 4),
+            "seconds": round(finished - started, 4),
+            "trips_per_second": round(created / (finished - started), 1) if finished > started else 0.0}
+
+def read_specs(path: str) -> List[Any]:
+    """Trip specs from a JSON array or JSON Lines file; ``-`` reads standard input."""
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        text = f.read()
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", help="JSON array or JSON Lines of trip specs, or - for standard input")
+    parser.add_argument("--user", required=True, help="username that will own the trips")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--solver", help="route solver (default: TRIP_SOLVER)")
+    parser.add_argument("--no-packing-list", action="store_true", help="do not add suggested packing lists")
+    args = parser.parse_args(argv)
+
+    specs = read_specs(args.path)
+    session = SessionLocal()
+    try:
+        user_id = session.scalar(select(User.id).where(User.username == args.user))
+        if user_id is None:
+            parser.error(f"no user named {args.user!r}")
+        # This process runs no other threads, so the pool can fork and share the snapshot.
+        result = create_trips(session, user_id, specs, max(1, args.workers), args.solver,
+                              packing_list=not args.no_packing_list, start_method="fork")
+    finally:
+        session.close()
+    for r in result["trips"]:
+        if r["status"] != "created":
+            print(f"  spec {r['index']}: {r['status']}: {r['error']}", file=sys.stderr)
+    print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
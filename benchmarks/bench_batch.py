@@ -0,0 +1,68 @@
+"""Trips per second for batch planning: a /plan-style loop vs. create_trips on a process pool.
+
+Every spec has a distinct (city, days, interests), so nothing comes from the
+plan cache, and the anytime solver is used so planning dominates. Runs
+against a scratch SQLite file with synthetic cities.
+
+Usage: python -m benchmarks.bench_batch [--trips 32] [--size 1500] [--workers 1 2 4] [--time-limit 0.1]
+"""
+import argparse
+import itertools
+import os
+import tempfile
+import time
+
+INTERESTS = ["", "history", "nature", "food", "history,nature", "culture,shopping", "temple,religion", "history,food"]
+
+def make_specs(cities, count):
+    combos = itertools.product(INTERESTS, cities, range(3, 15))
+    return [{"name": f"batch {n}", "city": city, "start_date": "2025-09-01", "days": days, "interests": interests}
+            for n, (interests, city, days) in zip(range(count), combos)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trips", type=int, default=32)
+    parser.add_argument("--size", type=int, default=1500, help="attractions per synthetic city")
+    parser.add_argument("--cities", type=int, default=2)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--time-limit", type=float, default=0.1, help="deadline for the anytime solver (s)")
+    args = parser.parse_args()
+
+    os.environ["TRIP_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="trip-batch-"), "trip.db")
+    os.environ["TRIP_SOLVER_TIME_LIMIT"] = str(args.time_limit)
+    from batch import create_trips
+    from benchmarks.synthetic import make_catalog, insert_catalog, insert_users
+    from itinerary import create_planned_trip
+    from migrations import upgrade
+    from models import SessionLocal
+    from plan_cache import plan_cache
+    from seed_data import seed
+
+    upgrade()
+    seed()
+    session = SessionLocal()
+    cities = [f"Synthetic {n}" for n in range(args.cities)]
+    for n, city in enumerate(cities):
+        insert_catalog(session, make_catalog(args.size, city=city, seed=n))
+    user_id = insert_users(session, 1)[0]
+    specs = make_specs(cities, args.trips)
+
+    plan_cache.clear()
+    start = time.perf_counter()
+    for spec in specs:
+        create_planned_trip(session, name=spec["name"], city=spec["city"], start_date=spec["start_date"],
+                            days=spec["days"], interests_csv=spec["interests"], user_id=user_id, solver="improve")
+    elapsed = time.perf_counter() - start
+    print(f"{'loop (create_planned_trip)':28} {len(specs) / elapsed:8.1f} trips/s  {elapsed:7.2f} s")
+
+    for workers in args.workers:
+        plan_cache.clear()
+        result = create_trips(session, user_id, specs, workers=workers, solver="improve")
+        assert result["created"] == len(specs), result
+        label = f"create_trips(workers={result['workers']})"
+        print(f"{label:28} {result['trips_per_second']:8.1f} trips/s  {result['seconds']:7.2f} s"
+              f"  (plan {result['plan_seconds']:.2f} s, persist {result['persist_seconds']:.3f} s)")
+    session.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Trips per second for /plan persistence: per-day commits vs. one bulk transaction.
+
+Runs against a scratch SQLite file so every commit pays its real fsync.
+
+Usage: python -m benchmarks.bench_persist [--trips 50] [--days 14]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+def legacy_create(session_factory, name, city, start_date, days, interests_csv, user_id):
+    """The pre-split /plan flow: commit the trip, then add items and commit once per day."""
+    from models import Trip, TripItem
+    from itinerary import compute_schedule
+
+    session = session_factory()
+    try:
+        trip = Trip(name=name, city=city, start_date=start_date, days=days, interests=interests_csv,
+                    user_id=user_id, budget=0.0)
+        session.add(trip)
+        session.commit()
+        rows = compute_schedule(city, start_date, days, interests_csv)
+        for day in range(1, days + 1):
+            for row in rows:
+                if row["day"] == day:
+                    session.add(TripItem(trip_id=trip.id, **row))
+            session.commit()
+    finally:
+        session.close()
+
+def bulk_create(session_factory, name, city, start_date, days, interests_csv, user_id):
+    from itinerary import create_planned_trip
+
+    session = session_factory()
+    try:
+        create_planned_trip(session, name=name, city=city, start_date=start_date, days=days,
+                            interests_csv=interests_csv, user_id=user_id)
+    finally:
+        session.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trips", type=int, default=50)
+    parser.add_argument("--days", type=int, default=14)
+    args = parser.parse_args()
+
+    os.environ["TRIP_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "trip.db")
+    from migrations import upgrade
+    from models import SessionLocal, User
+    from seed_data import seed
+
+    upgrade()
+    seed()
+    session = SessionLocal()
+    user = User(username="bench")
+    user.set_password("bench")
+    session.add(user)
+    session.commit()
+    user_id = user.id
+    session.close()
+
+    for label, create in (("per-day commits", legacy_create), ("bulk single txn", bulk_create)):
+        t0 = time.perf_counter()
+        for n in range(args.trips):
+            create(SessionLocal, f"trip {n}", ("Mumbai", "Pune", "Nashik")[n % 3], "2025-09-01",
+                   args.days, "history,nature,temple", user_id)
+        elapsed = time.perf_counter() - t0
+        print(f"{label:16} {args.trips / elapsed:8.1f} trips/s  ({elapsed * 1000 / args.trips:.1f} ms/trip)")
+
+if __name__ == "__main__":
+    main()
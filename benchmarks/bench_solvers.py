@@ -0,0 +1,35 @@
+"""Compare route solvers on synthetic catalogs.
+
+Usage: python -m benchmarks.bench_solvers [--sizes 200 1000 5000] [--days 3 7 14]
+"""
+import argparse
+import time
+
+from itinerary import SOLVERS, ImprovementSolver, DistanceMatrix, filter_attractions, route_km
+from benchmarks.synthetic import make_catalog
+
+def run(sizes, day_counts, time_limit, interests):
+    print(f"{'size':>6} {'days':>4} {'solver':>8} {'stops':>5} {'km':>10} {'ms':>9}")
+    for n in sizes:
+        catalog = make_catalog(n, seed=n)
+        center = (catalog[0].lat, catalog[0].lon)
+        matrix = DistanceMatrix([a.id for a in catalog], [a.lat for a in catalog], [a.lon for a in catalog])
+        candidates = filter_attractions(catalog, interests)
+        for days in day_counts:
+            for name, cls in SOLVERS.items():
+                solver = cls(time_limit=time_limit) if cls is ImprovementSolver else cls()
+                t0 = time.perf_counter()
+                schedule = solver.solve(matrix, candidates, center, days)
+                elapsed = (time.perf_counter() - t0) * 1000
+                stops = sum(len(d) for d in schedule)
+                print(f"{n:>6} {days:>4} {name:>8} {stops:>5} {route_km(schedule, center):>10.1f} {elapsed:>9.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 1000, 5000])
+    parser.add_argument("--days", type=int, nargs="+", default=[3, 7, 14])
+    parser.add_argument("--time-limit", type=float, default=0.25, help="deadline for anytime solvers (s)")
+    parser.add_argument("--interests", default="history,nature")
+    args = parser.parse_args()
+    run(args.sizes, args.days, args.time_limit,
+        [i.strip() for i in args.interests.split(",") if i.strip()])
@@ -0,0 +1,68 @@
+"""Cold-start latency: interpreter launch to the first served request.
+
+Each sample is a fresh ``python`` process that imports ``app``, calls
+``create_app()`` and serves one request through the test client, timing each
+phase. This is what every pre-forked worker pays before taking traffic. The
+database is initialized once up front, as a deployment would do with
+``flask --app app init-db``, so it is not part of the samples.
+
+Usage: python -m benchmarks.bench_startup [--runs 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child; prints phase timings (ms since the child started) as JSON.
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t_import = time.perf_counter()
+flask_app = app.create_app()
+t_create = time.perf_counter()
+status = flask_app.test_client().get("/api/trips").status_code  # login redirect: routing, auth, no template
+t_request = time.perf_counter()
+print(json.dumps({"import_ms": (t_import - t0) * 1000, "create_app_ms": (t_create - t_import) * 1000,
+                  "first_request_ms": (t_request - t_create) * 1000, "status": status,
+                  "reportlab_loaded": "reportlab" in sys.modules}))
+"""
+
+def sample(env):
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, check=True,
+                         capture_output=True, text=True).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+def measure(runs=10, env=None):
+    """Median of each phase over ``runs`` cold starts against an initialized scratch database."""
+    env = dict(os.environ if env is None else env)
+    if "TRIP_DB_PATH" not in env:
+        env["TRIP_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="trip-startup-"), "trip.db")
+        subprocess.run([sys.executable, "-c", "from seed_data import seed; seed()"], cwd=ROOT, env=env,
+                       check=True, capture_output=True)
+    samples = [sample(env) for _ in range(runs)]
+    summary = {key: statistics.median(s[key] for s in samples)
+               for key in ("import_ms", "create_app_ms", "first_request_ms", "process_ms")}
+    summary["reportlab_loaded"] = any(s["reportlab_loaded"] for s in samples)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    summary = measure(args.runs)
+    for key in ("import_ms", "create_app_ms", "first_request_ms", "process_ms"):
+        print(f"{key:18} median {summary[key]:9.1f} ms")
+    print(f"ReportLab imported before first PDF: {summary['reportlab_loaded']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Guard against N+1 queries on the itinerary routes.
+
+Plans a short and a long trip in a scratch database, then counts the SQL
+statements issued by ``view_trip`` and ``download_itinerary``. Exits non-zero
+if the count grows with trip length or exceeds MAX_STATEMENTS.
+
+Usage: python -m benchmarks.check_queries
+(``tests/test_query_counts.py`` runs the same check under pytest.)
+"""
+import os
+import sys
+import tempfile
+from typing import Dict, List
+
+MAX_STATEMENTS = 4  # user load + revision check + joined itinerary query + packing items
+
+ROUTES = ("/trip/{}", "/download_itinerary/{}")
+
+def statement_counts(app) -> Dict[str, List[int]]:
+    """Statements per request on each of ``ROUTES`` for a 1-day and a 10-day trip.
+
+    Needs a migrated, seeded database behind ``app``.
+    """
+    from sqlalchemy import event
+    from models import engine
+
+    statements = []
+    listener = lambda conn, cursor, stmt, *a: statements.append(stmt)
+    client = app.test_client()
+    client.post("/signup", data={"username": "query-check", "password": "pw"})
+    trip_ids = []
+    for days in (1, 10):
+        r = client.post("/plan", data={"name": f"{days} days", "city": "Mumbai", "start_date": "2025-09-01",
+                                       "days": str(days), "interests": ["history", "nature"]})
+        trip_id = int(r.headers["Location"].rsplit("/", 1)[1])
+        for n in range(5):
+            client.post(f"/add_packing_item/{trip_id}", data={"item_name": f"item {n}"})
+        trip_ids.append(trip_id)
+
+    counts = {}
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        for route in ROUTES:
+            counts[route] = []
+            for trip_id in trip_ids:
+                statements.clear()
+                r = client.get(route.format(trip_id))
+                assert r.status_code == 200, (route, r.status_code)
+                counts[route].append(len(statements))
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return counts
+
+def main():
+    os.environ["TRIP_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "trip.db")
+    from app import create_app
+    from migrations import upgrade
+    from models import engine
+    from seed_data import seed
+
+    upgrade(engine)
+    seed()
+    failures = []
+    for route, counts in statement_counts(create_app()).items():
+        print(f"{route.format('<id>'):28} statements per request (1-day, 10-day): {counts}")
+        if counts[0] != counts[1] or max(counts) > MAX_STATEMENTS:
+            failures.append(route)
+    if failures:
+        print("N+1 regression on: " + ", ".join(failures))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Reproducible performance suite on synthetic data.
+
+Builds a scratch database with synthetic cities of 1k-50k attractions, users
+and trips, times the planner, the main routes and worker cold starts, and writes the results as
+JSON. With ``--compare`` it checks the run against a stored baseline and exits
+non-zero if any benchmark's median got slower than the tolerance allows.
+
+Usage:
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --quick --compare bench.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+def timed(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return summarize(samples)
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {"runs": len(samples), "median_ms": statistics.median(samples), "min_ms": samples[0],
+            "p95_ms": samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]}
+
+def run_suite(sizes, repeat, users, trips_per_user, seed):
+    scratch = tempfile.mkdtemp(prefix="trip-bench-")
+    os.environ["TRIP_DB_PATH"] = os.path.join(scratch, "trip.db")
+    os.environ["TRIP_EXPORT_CACHE_DIR"] = os.path.join(scratch, "export_cache")
+
+    from app import create_app, page_cache
+    from benchmarks.bench_startup import sample
+    from benchmarks.synthetic import make_catalog, insert_catalog, insert_users
+    from catalog import catalog
+    from exports import export_cache
+    from itinerary import (compute_schedule, filter_attractions, create_planned_trip, get_distance_matrix,
+                           invalidate_distance_matrix)
+    from migrations import upgrade
+    from models import SessionLocal
+    from seed_data import seed as seed_attractions
+    from spatial import nearby
+
+    upgrade()
+    seed_attractions()
+    app = create_app()
+    results = {}
+    session = SessionLocal()
+    for n in sizes:
+        insert_catalog(session, make_catalog(n, city=f"Synth{n}", seed=seed + n))
+
+    for n in sizes:
+        city = f"Synth{n}"
+        records = catalog.city(city)
+        def build_matrix():
+            invalidate_distance_matrix(city)
+            get_distance_matrix(city, records)
+        results[f"distance_matrix_build[{n}]"] = timed(build_matrix, repeat)
+        results[f"nearby_k10[{n}]"] = timed(lambda: nearby(city, 18.9388, 72.8354, 5.0, 10), repeat)
+        results[f"filter_attractions[{n}]"] = timed(lambda: filter_attractions(records, ["history", "nature"]), repeat)
+        results[f"plan_itinerary[{n},3d]"] = timed(
+            lambda: compute_schedule(city, "2025-09-01", 3, "history,nature", use_cache=False), repeat)
+
+    # Background population so the trips table is not just the benchmark user's rows.
+    cities = ("Mumbai", "Pune", "Nashik")
+    for n, other_id in enumerate(insert_users(session, users)):
+        for k in range(5):
+            create_planned_trip(session, name=f"other {n}-{k}", city=cities[(n + k) % 3], start_date="2025-09-01",
+                                days=3, interests_csv="history", user_id=other_id)
+
+    client = app.test_client()
+    client.post("/signup", data={"username": "bench", "password": "bench"})
+    with client.session_transaction() as flask_session:
+        user_id = int(flask_session["_user_id"])
+        flask_session.pop("_flashes", None)  # a pending flash would bypass the page cache
+    trip_ids = [create_planned_trip(session, name=f"trip {n}", city="Mumbai", start_date="2025-09-01", days=7,
+                                    interests_csv="history,nature,temple", user_id=user_id).id
+                for n in range(trips_per_user)]
+    session.close()
+
+    def get_ok(url):
+        r = client.get(url)
+        assert r.status_code == 200, (url, r.status_code)
+
+    def download_uncached():
+        export_cache.directory = tempfile.mkdtemp(dir=scratch)
+        get_ok(f"/download_itinerary/{trip_ids[0]}")
+
+    def view_uncached():
+        page_cache.clear()
+        get_ok(f"/trip/{trip_ids[0]}")
+
+    def view_revalidate(etag):
+        r = client.get(f"/trip/{trip_ids[0]}", headers={"If-None-Match": etag})
+        assert r.status_code == 304, r.status_code
+
+    results["route:view_trip"] = timed(view_uncached, repeat)
+    results["route:view_trip(cached)"] = timed(lambda: get_ok(f"/trip/{trip_ids[0]}"), repeat)
+    etag = client.get(f"/trip/{trip_ids[0]}").headers["ETag"]
+    results["route:view_trip(304)"] = timed(lambda: view_revalidate(etag), repeat)
+    results["route:download_itinerary(render)"] = timed(download_uncached, repeat)
+    results["route:download_itinerary(cached)"] = timed(lambda: get_ok(f"/download_itinerary/{trip_ids[0]}"), repeat)
+    results[f"route:trips[{trips_per_user} trips]"] = timed(lambda: get_ok("/trips"), repeat)
+
+    to_delete = iter(reversed(trip_ids))
+    def delete_one():
+        r = client.post(f"/delete/{next(to_delete)}")
+        assert r.status_code == 302, r.status_code
+    results["route:delete_trip"] = timed(delete_one, min(repeat, len(trip_ids)))
+
+    # Fresh worker processes against the same (already initialized) database.
+    startup = [sample(dict(os.environ)) for _ in range(repeat)]
+    results["startup:import_to_first_request"] = summarize(
+        [s["import_ms"] + s["create_app_ms"] + s["first_request_ms"] for s in startup])
+    return results
+
+def compare(results, baseline, tolerance):
+    """Return (name, baseline_ms, current_ms) for each benchmark slower than baseline * (1 + tolerance)."""
+    regressions = []
+    for name, current in results.items():
+        old = baseline.get("results", {}).get(name)
+        if old and current["median_ms"] > old["median_ms"] * (1 + tolerance):
+            regressions.append((name, old["median_ms"], current["median_ms"]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="attractions per synthetic city")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--users", type=int, default=100, help="other users, with 5 trips each")
+    parser.add_argument("--trips", type=int, default=200, help="trips owned by the benchmark user")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--quick", action="store_true", help="small sizes for a fast smoke run")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, e.g. 0.2 = 20%%")
+    args = parser.parse_args()
+    if args.quick:
+        args.sizes, args.repeat, args.users, args.trips = [1000], 3, 10, 20
+
+    results = run_suite(args.sizes, args.repeat, args.users, args.trips, args.seed)
+    report = {"meta": {"python": platform.python_version(), "platform": platform.platform(),
+                       "sizes": args.sizes, "repeat": args.repeat, "users": args.users, "trips": args.trips, "seed": args.seed,
+                       "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+              "results": results}
+
+    for name, r in results.items():
+        print(f"{name:42} median {r['median_ms']:9.2f} ms   p95 {r['p95_ms']:9.2f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, old, new in regressions:
+            print(f"REGRESSION {name}: {old:.2f} ms -> {new:.2f} ms")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}.")
+
+if __name__ == "__main__":
+    main()
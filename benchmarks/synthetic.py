@@ -0,0 +1,51 @@
+"""Synthetic attraction catalogs for benchmarks (no database required)."""
+import random
+from types import SimpleNamespace
+
+CATEGORIES = ["history", "temple", "nature", "shopping", "food", "religion",
+              "architecture", "entertainment", "culture"]
+
+def make_catalog(n, city="Synthetic", center=(18.9388, 72.8354), spread_km=25.0, seed=0):
+    """Return ``n`` attraction-like objects scattered around ``center``.
+
+    Points are drawn from a few Gaussian clusters, which is closer to how real
+    attractions bunch up in old town / beach / temple districts than a uniform box.
+    """
+    rng = random.Random(seed)
+    deg = spread_km / 111.0
+    clusters = [(center[0] + rng.uniform(-deg, deg), center[1] + rng.uniform(-deg, deg))
+                for _ in range(max(1, n // 200))]
+    catalog = []
+    for i in range(1, n + 1):
+        clat, clon = rng.choice(clusters)
+        catalog.append(SimpleNamespace(
+            id=i, city=city, name=f"{city} Place {i}",
+            category=rng.choice(CATEGORIES),
+            duration_hours=rng.choice([0.5, 1.0, 1.0, 1.5, 1.5, 2.0, 2.5, 3.0]),
+            lat=clat + rng.gauss(0, deg / 6), lon=clon + rng.gauss(0, deg / 6),
+            image_path=None))
+    return catalog
+
+def insert_catalog(session, catalog):
+    """Bulk-insert a synthetic catalog (ids are reassigned by the database) and bump the catalog version."""
+    from sqlalchemy import insert
+    from models import Attraction, bump_catalog_version
+
+    rows = [{"city": a.city, "name": a.name, "category": a.category, "duration_hours": a.duration_hours,
+             "lat": a.lat, "lon": a.lon, "image_path": a.image_path} for a in catalog]
+    for start in range(0, len(rows), 5000):
+        session.execute(insert(Attraction), rows[start:start + 5000])
+    bump_catalog_version(session.connection())
+    session.commit()
+
+def insert_users(session, count, prefix="bench-user"):
+    """Create ``count`` users sharing one password hash (hashing is deliberately slow). Returns their ids."""
+    from sqlalchemy import insert, select
+    from werkzeug.security import generate_password_hash
+    from models import User
+
+    password_hash = generate_password_hash("bench")
+    session.execute(insert(User), [{"username": f"{prefix}-{n}", "password_hash": password_hash}
+                                   for n in range(count)])
+    session.commit()
+    return list(session.scalars(select(User.id).where(User.username.like(f"{prefix}-%")).order_by(User.id)))
@@ -0,0 +1,78 @@
+"""Small thread-safe in-process caches."""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+class LRUCache:
+    """Bounded mapping with least-recently-used eviction and an optional per-entry TTL.
+
+    With ``maxbytes`` the cache is also bounded by the total ``sizeof`` of its
+    values (``sys.getsizeof`` by default); a value larger than the whole budget
+    is not stored.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, maxbytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof or sys.getsizeof
+        self.bytes = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value, size)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and (entry[0] is None or entry[0] > time.monotonic()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not _MISSING:
+                del self._data[key]
+                self.bytes -= entry[2]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        size = self.sizeof(value) if self.maxbytes is not None else 0
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+            self._data[key] = (expires_at, value, size)
+            self.bytes += size
+            while len(self._data) > self.maxsize or (self.maxbytes is not None and self.bytes > self.maxbytes):
+                self.bytes -= self._data.popitem(last=False)[1][2]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            self.bytes -= entry[2]
+            return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"size": len(self._data), "maxsize": self.maxsize, "bytes": self.bytes,
+                    "maxbytes": self.maxbytes, "hits": self.hits,
+                    "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
@@ -0,0 +1,186 @@
+"""Process-wide, read-through cache of the attraction catalog.
+
+Attractions are held as compact ``AttractionRecord`` objects (not live ORM
+instances) keyed by city and by id. Every write to ``attractions`` bumps the
+version in ``catalog_meta``; the cache drops everything when it sees a new
+version. Commits from this process are noticed immediately, writes from other
+processes within ``CATALOG_RECHECK_SECONDS``. Per-city entries are kept for the
+``CATALOG_CACHE_CITIES`` most recently used cities; cities with no attractions
+or no stored center are never cached.
+"""
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+import models
+from caching import LRUCache
+from models import ReadSessionLocal, Attraction, CatalogMeta, CityCenter
+
+CATALOG_RECHECK_SECONDS = float(os.environ.get("TRIP_CATALOG_RECHECK_SECONDS", "5"))
+CATALOG_CACHE_CITIES = int(os.environ.get("TRIP_CATALOG_CACHE_CITIES", "256"))
+
+class AttractionRecord:
+    __slots__ = ("id", "city", "name", "category", "duration_hours", "lat", "lon", "image_path")
+
+    def __init__(self, id, city, name, category, duration_hours, lat, lon, image_path=None):
+        self.id = id
+        self.city = city
+        self.name = name
+        self.category = category
+        self.duration_hours = duration_hours
+        self.lat = lat
+        self.lon = lon
+        self.image_path = image_path
+
+    def __repr__(self):
+        return f"AttractionRecord(id={self.id!r}, city={self.city!r}, name={self.name!r})"
+
+_COLUMNS = [getattr(Attraction, name) for name in AttractionRecord.__slots__]
+
+class CatalogCache:
+    def __init__(self, session_factory=ReadSessionLocal, recheck_seconds: float = CATALOG_RECHECK_SECONDS,
+                 max_cities: int = CATALOG_CACHE_CITIES):
+        self.session_factory = session_factory
+        self.recheck_seconds = recheck_seconds
+        self._lock = threading.RLock()
+        self._by_city = LRUCache(maxsize=max_cities)  # city -> List[AttractionRecord]
+        self._by_id: Dict[int, AttractionRecord] = {}
+        self._centers = LRUCache(maxsize=max_cities)  # city -> (lat, lon)
+        self._version: Optional[int] = None
+        self._local_writes = models.catalog_local_writes
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self) -> bool:
+        return (self._version is not None and self._local_writes == models.catalog_local_writes
+                and time.monotonic() - self._checked_at < self.recheck_seconds)
+
+    def _sync(self):
+        """Drop cached rows if the catalog version moved; caller holds the lock."""
+        if self._fresh():
+            return
+        session = self.session_factory()
+        try:
+            self._local_writes = models.catalog_local_writes
+            version = models.get_catalog_version(session.connection())
+        finally:
+            session.close()
+        self._checked_at = time.monotonic()
+        if version != self._version:
+            self._by_city.clear()
+            self._by_id.clear()
+            self._centers.clear()
+            self._version = version
+
+    def version(self) -> int:
+        with self._lock:
+            self._sync()
+            return self._version
+
+    def city(self, city: str) -> List[AttractionRecord]:
+        """All attractions of ``city`` in id order."""
+        return self.city_snapshot(city)[1]
+
+    def city_snapshot(self, city: str) -> Tuple[int, List[AttractionRecord]]:
+        """``(version, records)``: the attractions of ``city`` in id order and the catalog version they are from.
+
+        Use this rather than ``version()`` then ``city()`` when the version keys
+        something derived from the records (a plan, a distance matrix), since
+        the catalog can move between two separate calls.
+        """
+        with self._lock:
+            self._sync()
+            version = self._version
+            records = self._by_city.get(city)
+            if records is not None:
+                self.hits += 1
+                return version, records
+            self.misses += 1
+        # One statement reads the rows together with the version they belong to. It runs
+        # without the lock, so a miss (say, an unknown city) does not stall every other lookup.
+        row_version = func.coalesce(select(CatalogMeta.version).where(CatalogMeta.id == 1).scalar_subquery(), 0)
+        session = self.session_factory()
+        try:
+            rows = session.execute(select(row_version, *_COLUMNS)
+                                   .where(Attraction.city == city).order_by(Attraction.id)).all()
+        finally:
+            session.close()
+        if not rows:
+            return version, []  # nothing to pair with a version, nothing cached
+        loaded = rows[0][0]
+        records = [AttractionRecord(*row[1:]) for row in rows]
+        with self._lock:
+            if self._version == loaded:
+                self._by_city.set(city, records)
+                for r in records:
+                    self._by_id[r.id] = r
+        return loaded, records
+
+    def center(self, city: str) -> Optional[Tuple[float, float]]:
+        """The stored ``city_centers`` position of ``city``, or None if it has none."""
+        with self._lock:
+            self._sync()
+            version = self._version
+            center = self._centers.get(city)
+            if center is not None:
+                return center
+        session = self.session_factory()
+        try:
+            row = session.execute(select(CityCenter.lat, CityCenter.lon).where(CityCenter.city == city)).first()
+        finally:
+            session.close()
+        if row is None:
+            return None
+        center = tuple(row)
+        with self._lock:
+            if self._version == version:
+                self._centers.set(city, center)
+        return center
+
+    def get(self, attraction_id: int) -> Optional[AttractionRecord]:
+        return self.get_many([attraction_id]).get(attraction_id)
+
+    def get_many(self, ids: Iterable[int]) -> Dict[int, AttractionRecord]:
+        """Look up several attractions, fetching all misses with one query."""
+        ids = set(ids)
+        with self._lock:
+            self._sync()
+            found = {i: self._by_id[i] for i in ids if i in self._by_id}
+            missing = ids - found.keys()
+            self.hits += len(found)
+            if missing:
+                self.misses += len(missing)
+                session = self.session_factory()
+                try:
+                    rows = session.execute(select(*_COLUMNS).where(Attraction.id.in_(missing)))
+                    for row in rows:
+                        r = AttractionRecord(*row)
+                        self._by_id[r.id] = found[r.id] = r
+                finally:
+                    session.close()
+            return found
+
+    def invalidate(self):
+        with self._lock:
+            self._by_city.clear()
+            self._by_id.clear()
+            self._centers.clear()
+            self._version = None
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "version": self._version,
+                "cities": len(self._by_city),
+                "attractions": len(self._by_id),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+catalog = CatalogCache()
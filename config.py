@@ -0,0 +1,55 @@
+"""Database engine settings, read from ``TRIP_*`` environment variables.
+
+Defaults target the bundled SQLite file: WAL journaling so readers don't block
+the writer, a busy timeout instead of immediate "database is locked" errors,
+and ``synchronous=NORMAL`` (safe under WAL). Any other SQLAlchemy URL can be
+given through ``TRIP_DATABASE_URL``; the SQLite pragmas are then skipped.
+"""
+import os
+from typing import Mapping, Optional
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), "trip.db")
+
+def _env(env, name, default):
+    value = env.get(name)
+    return default if value in (None, "") else value
+
+class DatabaseConfig:
+    def __init__(self, env: Optional[Mapping[str, str]] = None):
+        env = os.environ if env is None else env
+        db_path = _env(env, "TRIP_DB_PATH", DEFAULT_DB_PATH)
+        self.url = _env(env, "TRIP_DATABASE_URL", f"sqlite:///{db_path}")
+        # Optional engine for GET routes; "sqlite-ro" opens the same SQLite file read-only.
+        self.read_url = _env(env, "TRIP_READ_DATABASE_URL", None)
+        self.echo = _env(env, "TRIP_DB_ECHO", "0") == "1"
+
+        self.journal_mode = _env(env, "TRIP_SQLITE_JOURNAL_MODE", "WAL")
+        self.busy_timeout_ms = int(_env(env, "TRIP_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+        self.synchronous = _env(env, "TRIP_SQLITE_SYNCHRONOUS", "NORMAL")
+        self.mmap_size = int(_env(env, "TRIP_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+        self.cache_size = int(_env(env, "TRIP_SQLITE_CACHE_SIZE", "-20000"))  # negative = KiB, so ~20 MB
+
+        self.pool_size = int(_env(env, "TRIP_DB_POOL_SIZE", "5"))
+        self.max_overflow = int(_env(env, "TRIP_DB_MAX_OVERFLOW", "10"))
+        self.pool_timeout = float(_env(env, "TRIP_DB_POOL_TIMEOUT", "30"))
+        self.pool_recycle = int(_env(env, "TRIP_DB_POOL_RECYCLE", "-1"))
+
+    @property
+    def is_sqlite(self) -> bool:
+        return self.url.startswith("sqlite")
+
+    def sqlite_pragmas(self, read_only: bool = False):
+        """PRAGMA statements run on every new SQLite connection, in order."""
+        pragmas = [
+            f"PRAGMA busy_timeout = {self.busy_timeout_ms}",
+            "PRAGMA foreign_keys = ON",
+            f"PRAGMA cache_size = {self.cache_size}",
+            f"PRAGMA mmap_size = {self.mmap_size}",
+        ]
+        if read_only:
+            pragmas.append("PRAGMA query_only = ON")
+        else:
+            # journal_mode is persistent in the file; setting it needs write access.
+            pragmas.append(f"PRAGMA journal_mode = {self.journal_mode}")
+            pragmas.append(f"PRAGMA synchronous = {self.synchronous}")
+        return pragmas
@@ -1,5 +1,5 @@
-from models import Base, engine
+from migrations import upgrade
 
-print("Creating database tables...")
-Base.metadata.create_all(engine)
-print("Database tables created.")
\ No newline at end of file
+print("Creating / upgrading database tables...")
+version = upgrade()
+print(f"Database tables ready (schema version {version}).")
\ No newline at end of file
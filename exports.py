@@ -0,0 +1,273 @@
+"""PDF itinerary export: rendering, an on-disk result cache and a background job queue.
+
+Rendered PDFs are stored under ``EXPORT_CACHE_DIR`` named by a SHA-256 of the
+trip, its items and their attraction data (``export_key``), so an unchanged
+itinerary is never rendered twice and the key doubles as the HTTP ETag. The
+directory is pruned to ``EXPORT_CACHE_BYTES`` and ``EXPORT_CACHE_MAX_AGE``.
+Export job records live in its ``jobs/`` subdirectory, so every worker
+process sharing the directory can answer status and download requests.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, Dict, Optional
+
+import metrics
+
+EXPORT_CACHE_DIR = os.environ.get("TRIP_EXPORT_CACHE_DIR", os.path.join(os.path.dirname(__file__), "export_cache"))
+EXPORT_WORKERS = int(os.environ.get("TRIP_EXPORT_WORKERS", "2"))
+EXPORT_JOB_TTL = 3600  # seconds a finished job stays pollable
+EXPORT_CACHE_BYTES = int(os.environ.get("TRIP_EXPORT_CACHE_BYTES", str(256 * 1024 * 1024)))
+EXPORT_CACHE_MAX_AGE = float(os.environ.get("TRIP_EXPORT_CACHE_MAX_AGE", str(7 * 24 * 3600)))  # seconds since last use
+
+def trip_info(trip) -> Dict[str, Any]:
+    """The trip fields that appear in the PDF, detached from the ORM session."""
+    return {"id": trip.id, "name": trip.name, "city": trip.city, "start_date": trip.start_date,
+            "days": trip.days, "interests": trip.interests}
+
+def export_key(info: Dict[str, Any], days_data: Dict[int, list]) -> str:
+    payload = json.dumps({"trip": info, "days": sorted(days_data.items())}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def render_itinerary_pdf(info: Dict[str, Any], days_data: Dict[int, list]) -> bytes:
+    # ReportLab is slow to import and only needed here, so workers load it on their first render.
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, rightMargin=inch/2, leftMargin=inch/2, topMargin=inch/2, bottomMargin=inch/2)
+    styles = getSampleStyleSheet()
+    story = []
+
+    # Title
+    story.append(Paragraph(f"Trip Itinerary: {info['name']}", styles['h1']))
+    story.append(Spacer(1, 0.2 * inch))
+
+    # Trip Details
+    story.append(Paragraph(f"City: {info['city']}", styles['h3']))
+    story.append(Paragraph(f"Start Date: {info['start_date']}", styles['h3']))
+    story.append(Paragraph(f"Days: {info['days']}", styles['h3']))
+    story.append(Paragraph(f"Interests: {info['interests'] or '—'}", styles['h3']))
+    story.append(Spacer(1, 0.4 * inch))
+
+    # Day-wise Itinerary
+    for day_num in sorted(days_data.keys()):
+        story.append(Paragraph(f"Day {day_num}", styles['h2']))
+        story.append(Spacer(1, 0.1 * inch))
+        if days_data[day_num]:
+            for item in days_data[day_num]:
+                story.append(Paragraph(f"- {item['name']} ({item['start']} - {item['end']}) - {item['category']} ({item['duration']:.1f}h)", styles['Normal']))
+            story.append(Spacer(1, 0.2 * inch))
+        else:
+            story.append(Paragraph("No activities planned for this day.", styles['Normal']))
+            story.append(Spacer(1, 0.2 * inch))
+        story.append(PageBreak())
+
+    # Map Placeholder
+    story.append(Paragraph("Map Snapshot: [Map visualization would go here]", styles['h2']))
+    story.append(Paragraph("Due to limitations, a dynamic map snapshot cannot be generated in the PDF. Please refer to the web application for interactive maps.", styles['Normal']))
+    story.append(Spacer(1, 0.2 * inch))
+
+    with metrics.timer("pdf_build"):
+        doc.build(story)
+    return buffer.getvalue()
+
+class ExportCache:
+    """Rendered PDFs on disk, one file per export key.
+
+    A file's mtime is its last use: hits refresh it, and ``prune`` (run after
+    every write) removes files unused for ``max_age`` seconds, then the least
+    recently used ones until the directory holds at most ``max_bytes``.
+    """
+
+    def __init__(self, directory: str = EXPORT_CACHE_DIR, max_bytes: int = EXPORT_CACHE_BYTES,
+                 max_age: float = EXPORT_CACHE_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, data: bytes) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        # Write then rename so readers never see a partial file.
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.path(key))
+        self.prune(keep=key)
+        return self.path(key)
+
+    def prune(self, keep: Optional[str] = None):
+        """Apply the age and size limits; ``keep`` (the file just written) is never removed."""
+        now = time.time()
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.is_file() or entry.name == f"{keep}.pdf":
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:  # removed by another worker meanwhile
+                    continue
+                # Leftover .part files are from writers that died; live ones are seconds old.
+                limit = EXPORT_JOB_TTL if entry.name.endswith(".part") else self.max_age
+                if now - st.st_mtime > limit:
+                    self._remove(entry.path)
+                elif entry.name.endswith(".pdf"):
+                    files.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        if keep is not None and os.path.exists(self.path(keep)):
+            total += os.path.getsize(self.path(keep))
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def render(self, key: str, info: Dict[str, Any], days_data: Dict[int, list]) -> str:
+        """Return the cached file for ``key``, rendering it first if needed."""
+        return self.get(key) or self.put(key, render_itinerary_pdf(info, days_data))
+
+class ExportJob:
+    __slots__ = ("id", "user_id", "trip_id", "key", "filename", "status", "error", "finished_at")
+
+    def __init__(self, user_id: int, trip_id: int, key: str, filename: str):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.trip_id = trip_id
+        self.key = key
+        self.filename = filename
+        self.status = "queued"
+        self.error = None
+        self.finished_at = None  # wall-clock time, comparable across processes
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"job_id": self.id, "trip_id": self.trip_id, "status": self.status, "error": self.error}
+
+    def to_record(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "ExportJob":
+        job = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(job, name, record.get(name))
+        return job
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+class ExportQueue:
+    """Renders PDFs on a local thread pool; identical pending exports share one job.
+
+    Every job state change is written to ``<cache dir>/jobs/<job id>.json``,
+    which is what ``get`` reads, so any worker process can report on a job
+    that another one is rendering.
+    """
+
+    def __init__(self, cache: ExportCache, workers: int = EXPORT_WORKERS):
+        self.cache = cache
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending: Dict[str, ExportJob] = {}  # export key -> queued/running job in this process
+
+    @property
+    def jobs_directory(self) -> str:
+        return os.path.join(self.cache.directory, "jobs")
+
+    def _save(self, job: ExportJob):
+        os.makedirs(self.jobs_directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.jobs_directory, suffix=".part")
+        with os.fdopen(fd, "w") as f:
+            json.dump(job.to_record(), f)
+        os.replace(tmp, os.path.join(self.jobs_directory, f"{job.id}.json"))
+
+    def submit(self, user_id: int, info: Dict[str, Any], days_data: Dict[int, list]) -> ExportJob:
+        key = export_key(info, days_data)
+        with self._lock:
+            self._prune()
+            pending = self._pending.get(key)
+            if pending is not None and pending.user_id == user_id:
+                return pending
+            job = ExportJob(user_id, info["id"], key, f"{info['name']}_itinerary.pdf")
+            if self.cache.get(key):
+                self._finish(job, "done")
+                return job
+            self._pending[key] = job
+            self._save(job)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pdf-export")
+        self._executor.submit(self._run, job, info, days_data)
+        return job
+
+    def get(self, job_id: str, user_id: int) -> Optional[ExportJob]:
+        if not _JOB_ID.fullmatch(job_id):
+            return None
+        try:
+            with open(os.path.join(self.jobs_directory, f"{job_id}.json")) as f:
+                job = ExportJob.from_record(json.load(f))
+        except (FileNotFoundError, ValueError):
+            return None
+        return job if job.user_id == user_id else None
+
+    def _run(self, job: ExportJob, info, days_data):
+        job.status = "running"
+        self._save(job)
+        try:
+            self.cache.render(job.key, info, days_data)
+        except Exception as exc:
+            with self._lock:
+                self._finish(job, "failed", str(exc))
+        else:
+            with self._lock:
+                self._finish(job, "done")
+
+    def _finish(self, job: ExportJob, status: str, error: str = None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        self._save(job)
+        if self._pending.get(job.key) is job:
+            del self._pending[job.key]
+
+    def _prune(self):
+        """Remove job records not updated for ``EXPORT_JOB_TTL`` seconds."""
+        cutoff = time.time() - EXPORT_JOB_TTL
+        try:
+            entries = list(os.scandir(self.jobs_directory))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+export_cache = ExportCache()
+export_queue = ExportQueue(export_cache)
@@ -0,0 +1,224 @@
+"""Streaming bulk importer for the attraction catalog.
+
+Reads CSV (with a header row) or JSON Lines records with the fields ``city``,
+``name``, ``category``, ``duration_hours``, ``lat``, ``lon`` and an optional
+``image_path``. Each row is validated, then rows are upserted on (city, name)
+in batches of ``--batch-size``, one executemany per transaction, so memory
+stays flat however large the file is. Rows identical to the stored ones are
+not rewritten: importing the same file twice changes nothing and leaves the
+catalog version alone. The centers of all touched cities are recomputed at
+the end.
+
+Usage:
+    python importer.py attractions.csv [--format csv|jsonl] [--batch-size 5000]
+                       [--category extra-category ...] [--dry-run]
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from sqlalchemy import or_
+
+import models
+from models import engine, Attraction, bump_catalog_version, refresh_city_centers
+
+CATEGORIES = frozenset({"architecture", "culture", "entertainment", "food", "history", "nature",
+                        "religion", "shopping", "temple"})
+BATCH_SIZE = int(os.environ.get("TRIP_IMPORT_BATCH_SIZE", "5000"))
+FIELDS = ("city", "name", "category", "duration_hours", "lat", "lon", "image_path")
+MAX_DURATION_HOURS = 24.0
+MAX_ERRORS_KEPT = 20  # invalid rows beyond this are only counted
+
+_UPDATED_COLUMNS = ("category", "duration_hours", "lat", "lon", "image_path")
+
+class ImportStats:
+    __slots__ = ("read", "written", "invalid", "batches", "cities", "errors", "started")
+
+    def __init__(self):
+        self.read = 0
+        self.written = 0
+        self.invalid = 0
+        self.batches = 0
+        self.cities = set()
+        self.errors = []
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self) -> float:
+        return self.read / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"read": self.read, "written": self.written, "unchanged": self.read - self.invalid - self.written,
+                "invalid": self.invalid, "batches": self.batches, "cities": len(self.cities),
+                "seconds": round(self.elapsed, 3), "rows_per_second": round(self.rate, 1)}
+
+def read_rows(path: str, fmt: Optional[str] = None) -> Iterator[Tuple[int, Any]]:
+    """Yield ``(line_number, record)`` one at a time; ``-`` reads standard input.
+
+    CSV records are dicts; JSON Lines records are the raw line, decoded by
+    ``validate_row`` so a malformed line counts as one invalid row.
+    """
+    if fmt is None:
+        ext = os.path.splitext(path)[1].lower()
+        fmt = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}.get(ext)
+        if fmt is None:
+            raise ValueError(f"Cannot tell the format of {path!r}; pass --format")
+    f = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8-sig")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    yield line_no, line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def _number(raw, field: str) -> float:
+    try:
+        value = float(raw[field])
+    except KeyError:
+        raise ValueError(f"missing {field}") from None
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} is not a number: {raw[field]!r}") from None
+    if not math.isfinite(value):
+        raise ValueError(f"{field} is not finite")
+    return value
+
+def validate_row(raw, categories=CATEGORIES) -> Dict[str, Any]:
+    """Check and normalize one record into an ``attractions`` row; raise ValueError if unusable."""
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"invalid JSON: {exc.msg}") from None
+        if not isinstance(raw, dict):
+            raise ValueError("record is not an object")
+    city = " ".join(str(raw.get("city") or "").split())  # same normalization as the planner
+    name = " ".join(str(raw.get("name") or "").split())
+    if not city or len(city) > 40:
+        raise ValueError("city must be 1-40 characters")
+    if not name or len(name) > 120:
+        raise ValueError("name must be 1-120 characters")
+    category = str(raw.get("category") or "").strip().lower()
+    if category not in categories:
+        raise ValueError(f"unknown category {category!r}")
+    duration = _number(raw, "duration_hours")
+    if not 0 < duration <= MAX_DURATION_HOURS:
+        raise ValueError(f"duration_hours out of range: {duration}")
+    lat, lon = _number(raw, "lat"), _number(raw, "lon")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError(f"coordinates out of range: {lat}, {lon}")
+    if lat == 0 and lon == 0:
+        raise ValueError("coordinates are 0, 0 (missing geocode?)")
+    image_path = raw.get("image_path") or None
+    if image_path is not None and len(str(image_path)) > 200:
+        raise ValueError("image_path longer than 200 characters")
+    return {"city": city, "name": name, "category": category, "duration_hours": duration,
+            "lat": lat, "lon": lon, "image_path": image_path}
+
+def upsert_statement(dialect_name: str):
+    """INSERT ... ON CONFLICT (city, name) DO UPDATE, skipping rows that would not change."""
+    # Dialect modules are imported here; the PostgreSQL one alone costs ~50 ms at app import.
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        raise ValueError(f"The importer does not support {dialect_name!r} databases")
+    stmt = dialect_insert(Attraction)
+    return stmt.on_conflict_do_update(
+        index_elements=["city", "name"],
+        set_={c: stmt.excluded[c] for c in _UPDATED_COLUMNS},
+        where=or_(*(getattr(Attraction, c).is_distinct_from(stmt.excluded[c]) for c in _UPDATED_COLUMNS)))
+
+def import_attractions(records: Iterable[Tuple[int, Any]], engine=engine, batch_size: int = BATCH_SIZE,
+                       categories=CATEGORIES, dry_run: bool = False,
+                       progress: Optional[Callable[[ImportStats], None]] = None) -> ImportStats:
+    """Validate and upsert ``(line_number, record)`` pairs batch by batch.
+
+    Each batch is its own transaction and bumps the catalog version if it
+    wrote anything, so a failure keeps every earlier batch. With ``dry_run``
+    rows are only validated.
+    """
+    stats = ImportStats()
+    stmt = upsert_statement(engine.dialect.name)
+    batch = []
+
+    def flush():
+        if batch and not dry_run:
+            with engine.begin() as conn:
+                written = conn.execute(stmt, batch).rowcount
+                if written:
+                    bump_catalog_version(conn)
+            if written:
+                stats.written += written
+                models.catalog_local_writes += 1
+        stats.batches += 1
+        batch.clear()
+        if progress is not None:
+            progress(stats)
+
+    for line_no, record in records:
+        stats.read += 1
+        try:
+            row = validate_row(record, categories)
+        except ValueError as exc:
+            stats.invalid += 1
+            if len(stats.errors) < MAX_ERRORS_KEPT:
+                stats.errors.append(f"line {line_no}: {exc}")
+            continue
+        batch.append(row)
+        stats.cities.add(row["city"])
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    if stats.written:
+        with engine.begin() as conn:
+            refresh_city_centers(conn, stats.cities)
+            bump_catalog_version(conn)
+        models.catalog_local_writes += 1
+    return stats
+
+def _report(stats: ImportStats):
+    print(f"\r{stats.read:>10,} rows read  {stats.written:>10,} written  {stats.invalid:>8,} invalid"
+          f"  {stats.rate:>10,.0f} rows/s", end="", file=sys.stderr, flush=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", help="CSV or JSON Lines file, or - for standard input")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--category", action="append", default=[],
+                        help="accept an extra category (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="validate only, write nothing")
+    args = parser.parse_args(argv)
+
+    from migrations import upgrade
+    upgrade(engine)  # the upsert needs the (city, name) unique index
+    categories = CATEGORIES | {c.strip().lower() for c in args.category}
+    stats = import_attractions(read_rows(args.path, args.format), engine, max(1, args.batch_size),
+                               categories, args.dry_run, progress=_report)
+    print(file=sys.stderr)
+    for error in stats.errors:
+        print(f"  skipped {error}", file=sys.stderr)
+    if stats.invalid > len(stats.errors):
+        print(f"  ... and {stats.invalid - len(stats.errors)} more invalid rows", file=sys.stderr)
+    print(json.dumps(stats.to_dict()))
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,38 @@
 import math
+import os
+import time
+from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
-from models import SessionLocal, Attraction, TripItem
+from typing import List, Dict, Any, Optional, Set, Tuple
+import numpy as np
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import contains_eager, selectinload
+from models import SessionLocal, Attraction, PackingItem, Trip, TripItem, bump_trip_revision
+from caching import LRUCache
+from catalog import catalog
+from packing import packing_rows, suggest_packing_items
+from plan_cache import plan_cache
+from spatial import EARTH_RADIUS_KM, GridIndex, haversine_many
+import metrics
 
 DAILY_HOURS = 7.0
+# Above this many attractions a full float32 matrix gets too large (4000² ≈ 64 MB),
+# so rows are computed on demand instead of being precomputed.
+MATRIX_MAX_ROWS = 4000
+# Matrices are filled this many cells at a time, bounding the float64 temporaries to ~8 MB each.
+MATRIX_BLOCK_CELLS = 1 << 20
+# Total size of the distance matrices kept across cities; least recently used cities go first.
+MATRIX_CACHE_BYTES = int(os.environ.get("TRIP_MATRIX_CACHE_BYTES", str(256 * 1024 * 1024)))
+# Route solver used by plan_itinerary ("greedy" or "improve") and the wall-clock
+# budget, in seconds, given to anytime solvers.
+DEFAULT_SOLVER = os.environ.get("TRIP_SOLVER", "greedy")
+SOLVER_TIME_LIMIT = float(os.environ.get("TRIP_SOLVER_TIME_LIMIT", "0.25"))
+# From this many candidates on, greedy steps search the grid index outward from
+# the current stop instead of computing distances to every remaining candidate.
+SPATIAL_MIN_CANDIDATES = int(os.environ.get("TRIP_SPATIAL_MIN_CANDIDATES", "5000"))
 
 def haversine(lat1, lon1, lat2, lon2):
-    R = 6371.0
+    R = EARTH_RADIUS_KM
     phi1, phi2 = math.radians(lat1), math.radians(lat2)
     dphi = math.radians(lat2 - lat1)
     dlambda = math.radians(lon2 - lon1)
@@ -20,6 +46,82 @@ CITY_CENTERS = {
     "Nashik": (19.9975, 73.7898),
 }
 
+def city_center(city: str, attractions: List[Attraction]):
+    """Where each day starts: a curated center, else the imported one, else the first attraction."""
+    return CITY_CENTERS.get(city) or catalog.center(city) or (attractions[0].lat, attractions[0].lon)
+
+class DistanceMatrix:
+    """Pairwise distances between every attraction of one city.
+
+    Rows are addressed through ``index`` (attraction id -> row). Small cities get
+    the full matrix up front; larger ones fall back to computing a row per call.
+    """
+
+    def __init__(self, ids: List[int], lats: List[float], lons: List[float]):
+        self.ids = tuple(ids)
+        self.index = {aid: row for row, aid in enumerate(self.ids)}
+        self.lats = np.radians(np.asarray(lats, dtype=np.float64))
+        self.lons = np.radians(np.asarray(lons, dtype=np.float64))
+        self.matrix = None
+        self._grid = None
+        n = len(self.ids)
+        if n <= MATRIX_MAX_ROWS:
+            self.matrix = np.empty((n, n), dtype=np.float32)
+            block = max(1, MATRIX_BLOCK_CELLS // max(n, 1))
+            for start in range(0, n, block):
+                stop = min(start + block, n)
+                self.matrix[start:stop] = haversine_many(self.lats[start:stop, None], self.lons[start:stop, None],
+                                                         self.lats[None, :], self.lons[None, :])
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.lats.nbytes + self.lons.nbytes + (self.matrix.nbytes if self.matrix is not None else 0)
+
+    def row(self, i: int) -> np.ndarray:
+        """Distances (km) from row ``i`` to every row."""
+        if self.matrix is not None:
+            return self.matrix[i]
+        return haversine_many(self.lats[i], self.lons[i], self.lats, self.lons)
+
+    def from_point(self, lat: float, lon: float) -> np.ndarray:
+        """Distances (km) from an arbitrary point (degrees) to every row."""
+        return haversine_many(math.radians(lat), math.radians(lon), self.lats, self.lons)
+
+    @property
+    def grid(self) -> GridIndex:
+        """Grid index over the same rows, built on first use."""
+        if self._grid is None:
+            self._grid = GridIndex(np.degrees(self.lats), np.degrees(self.lons))
+        return self._grid
+
+# city -> (catalog version, DistanceMatrix), bounded by MATRIX_CACHE_BYTES
+_matrices = LRUCache(maxsize=100_000, maxbytes=MATRIX_CACHE_BYTES, sizeof=lambda entry: entry[1].nbytes)
+
+def get_distance_matrix(city: str, attractions: List[Attraction], version: Optional[int] = None) -> DistanceMatrix:
+    """Return the cached matrix for ``city``, rebuilding it when the catalog changed.
+
+    With a catalog ``version`` the cache entry is reused while the version is
+    unchanged; without one, while the city's set of attraction ids is unchanged.
+    """
+    ids = tuple(sorted(a.id for a in attractions)) if version is None else None
+    entry = _matrices.get(city)
+    if entry is not None and (entry[0] == version if version is not None else entry[1].ids == ids):
+        return entry[1]
+    by_id = {a.id: a for a in attractions}
+    ids = ids or tuple(sorted(by_id))
+    m = DistanceMatrix(ids, [by_id[i].lat for i in ids], [by_id[i].lon for i in ids])
+    _matrices.set(city, (version, m))
+    return m
+
+def invalidate_distance_matrix(city: Optional[str] = None):
+    if city is None:
+        _matrices.clear()
+    else:
+        _matrices.pop(city)
+
 def filter_attractions(all_attractions: List[Attraction], interests: List[str]) -> List[Attraction]:
     if not interests:
         return all_attractions
@@ -34,51 +136,508 @@ def filter_attractions(all_attractions: List[Attraction], interests: List[str])
                 break
     return filtered
 
-def plan_itinerary(city: str, start_date: str, days: int, interests_csv: str, trip_id: int):
-    session = SessionLocal()
+def greedy_days(matrix: DistanceMatrix, candidates: List[Attraction], center, days: int,
+                daily_hours: float = DAILY_HOURS) -> List[List[Attraction]]:
+    """Greedy nearest-neighbour per day, respecting the ``daily_hours`` time budget."""
+    if len(candidates) >= SPATIAL_MIN_CANDIDATES:
+        return _greedy_days_spatial(matrix, candidates, center, days, daily_hours)
+    rows = np.fromiter((matrix.index[a.id] for a in candidates), dtype=np.intp, count=len(candidates))
+    durations = np.fromiter((a.duration_hours for a in candidates), dtype=np.float64, count=len(candidates))
+    remaining = np.ones(len(candidates), dtype=bool)
+    schedule = []
+    for _ in range(days):
+        day_hours = 0.0
+        day_items = []
+        dist = matrix.from_point(*center)[rows]
+        while remaining.any():
+            # pick nearest remaining stop that still fits in the day
+            fits = remaining & (day_hours + durations <= daily_hours)
+            if not fits.any():
+                break
+            k = int(np.argmin(np.where(fits, dist, np.inf)))
+            a = candidates[k]
+            day_items.append(a)
+            remaining[k] = False
+            day_hours += a.duration_hours
+            dist = matrix.row(rows[k])[rows]
+        schedule.append(day_items)
+    return schedule
+
+def _greedy_days_spatial(matrix: DistanceMatrix, candidates: List[Attraction], center, days: int,
+                         daily_hours: float) -> List[List[Attraction]]:
+    """``greedy_days`` on the grid index, so each step costs in proportion to local density."""
+    grid = matrix.grid
+    rows = np.fromiter((matrix.index[a.id] for a in candidates), dtype=np.intp, count=len(candidates))
+    position = np.full(len(matrix), -1, dtype=np.intp)  # matrix row -> candidate
+    position[rows] = np.arange(len(candidates))
+    remaining = position >= 0
+    durations = np.zeros(len(matrix), dtype=np.float64)
+    durations[rows] = np.fromiter((a.duration_hours for a in candidates), dtype=np.float64, count=len(candidates))
+    left = dict(zip(*(v.tolist() for v in np.unique(durations[remaining], return_counts=True))))  # duration -> stops left
+    schedule = []
+    for _ in range(days):
+        day_hours = 0.0
+        day_items = []
+        lat, lon = center
+        # Checking the few distinct durations tells whether anything still fits without a search.
+        while any(n and day_hours + d <= daily_hours for d, n in left.items()):
+            fits = lambda idx: remaining[idx] & (day_hours + durations[idx] <= daily_hours)
+            row = grid.nearest(lat, lon, where=fits)
+            if row is None:
+                break
+            a = candidates[position[row]]
+            day_items.append(a)
+            remaining[row] = False
+            left[a.duration_hours] -= 1
+            day_hours += a.duration_hours
+            lat, lon = a.lat, a.lon
+        schedule.append(day_items)
+    return schedule
+
+def route_km(schedule: List[List[Attraction]], center) -> float:
+    """Total travel distance of a schedule; each day starts at the city center."""
+    total = 0.0
+    for day_items in schedule:
+        cur_lat, cur_lon = center
+        for a in day_items:
+            total += haversine(cur_lat, cur_lon, a.lat, a.lon)
+            cur_lat, cur_lon = a.lat, a.lon
+    return total
+
+class RouteSolver(ABC):
+    """Strategy interface for turning candidates into a day-by-day schedule."""
+    name = "base"
+
+    @abstractmethod
+    def solve(self, matrix: DistanceMatrix, candidates: List[Attraction], center, days: int,
+              daily_hours: float = DAILY_HOURS) -> List[List[Attraction]]:
+        """Visit order per day, each day within ``daily_hours``."""
+
+class GreedySolver(RouteSolver):
+    """Nearest-neighbour construction, filling each day before moving to the next."""
+    name = "greedy"
+
+    def solve(self, matrix, candidates, center, days, daily_hours=DAILY_HOURS):
+        return greedy_days(matrix, candidates, center, days, daily_hours)
+
+class ImprovementSolver(RouteSolver):
+    """Anytime local search on top of the greedy schedule.
+
+    Applies 2-opt within a day, relocation of 1-3 stop segments within or
+    between days (or-opt) and stop swaps between days, never exceeding
+    ``daily_hours``. Stops improving when no move helps or ``time_limit`` seconds
+    have passed, returning the best schedule found so far.
+    """
+    name = "improve"
+    EPS = 1e-9
+
+    def __init__(self, time_limit: float = None):
+        self.time_limit = SOLVER_TIME_LIMIT if time_limit is None else time_limit
+
+    def solve(self, matrix, candidates, center, days, daily_hours=DAILY_HOURS):
+        deadline = time.perf_counter() + self.time_limit
+        schedule = greedy_days(matrix, candidates, center, days, daily_hours)
+        stops = [a for day_items in schedule for a in day_items]
+        if len(stops) < 2:
+            return schedule
+
+        # Small dense matrix over the scheduled stops only; node 0 is the city center.
+        lats = np.radians([center[0]] + [a.lat for a in stops])
+        lons = np.radians([center[1]] + [a.lon for a in stops])
+        dist = haversine_many(lats[:, None], lons[:, None], lats[None, :], lons[None, :]).tolist()
+        hours = [0.0] + [a.duration_hours for a in stops]
+        routes, node = [], 1
+        for day_items in schedule:
+            routes.append(list(range(node, node + len(day_items))))
+            node += len(day_items)
+        day_hours = [sum(hours[n] for n in r) for r in routes]
+
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = self._two_opt(dist, routes, deadline)
+            improved = self._relocate(dist, hours, routes, day_hours, daily_hours, deadline) or improved
+            improved = self._swap(dist, hours, routes, day_hours, daily_hours, deadline) or improved
+        return [[stops[n - 1] for n in r] for r in routes]
+
+    def _two_opt(self, dist, routes, deadline):
+        improved = False
+        for r in routes:
+            for i in range(len(r) - 1):
+                if time.perf_counter() >= deadline:
+                    return improved
+                prev = r[i - 1] if i else 0
+                for j in range(i + 1, len(r)):
+                    delta = dist[prev][r[j]] - dist[prev][r[i]]
+                    if j + 1 < len(r):
+                        nxt = r[j + 1]
+                        delta += dist[r[i]][nxt] - dist[r[j]][nxt]
+                    if delta < -self.EPS:
+                        r[i:j + 1] = r[i:j + 1][::-1]
+                        improved = True
+                        prev = r[i - 1] if i else 0
+        return improved
+
+    def _relocate(self, dist, hours, routes, day_hours, daily_hours, deadline):
+        for di, r in enumerate(routes):
+            for i in range(len(r)):
+                if time.perf_counter() >= deadline:
+                    return False
+                for seg_len in (1, 2, 3):
+                    if i + seg_len > len(r):
+                        break
+                    seg = r[i:i + seg_len]
+                    seg_hours = sum(hours[n] for n in seg)
+                    prev = r[i - 1] if i else 0
+                    nxt = r[i + seg_len] if i + seg_len < len(r) else None
+                    gain = dist[prev][seg[0]]
+                    if nxt is not None:
+                        gain += dist[seg[-1]][nxt] - dist[prev][nxt]
+                    for dj, target in enumerate(routes):
+                        if dj == di:
+                            base = r[:i] + r[i + seg_len:]
+                        elif day_hours[dj] + seg_hours > daily_hours + self.EPS:
+                            continue
+                        else:
+                            base = target
+                        for p in range(len(base) + 1):
+                            a = base[p - 1] if p else 0
+                            b = base[p] if p < len(base) else None
+                            for s in (seg, seg[::-1]):
+                                add = dist[a][s[0]]
+                                if b is not None:
+                                    add += dist[s[-1]][b] - dist[a][b]
+                                if add - gain < -self.EPS:
+                                    base[p:p] = s
+                                    routes[dj] = base
+                                    if dj != di:
+                                        del r[i:i + seg_len]
+                                        day_hours[di] -= seg_hours
+                                        day_hours[dj] += seg_hours
+                                    return True
+        return False
+
+    def _swap(self, dist, hours, routes, day_hours, daily_hours, deadline):
+        def replace_delta(r, i, new):
+            prev = r[i - 1] if i else 0
+            old = r[i]
+            delta = dist[prev][new] - dist[prev][old]
+            if i + 1 < len(r):
+                delta += dist[new][r[i + 1]] - dist[old][r[i + 1]]
+            return delta
+
+        for di in range(len(routes)):
+            for dj in range(di + 1, len(routes)):
+                if time.perf_counter() >= deadline:
+                    return False
+                ri, rj = routes[di], routes[dj]
+                for i, x in enumerate(ri):
+                    for j, y in enumerate(rj):
+                        shift = hours[y] - hours[x]
+                        if (day_hours[di] + shift > daily_hours + self.EPS
+                                or day_hours[dj] - shift > daily_hours + self.EPS):
+                            continue
+                        if replace_delta(ri, i, y) + replace_delta(rj, j, x) < -self.EPS:
+                            ri[i], rj[j] = y, x
+                            day_hours[di] += shift
+                            day_hours[dj] -= shift
+                            return True
+        return False
+
+SOLVERS = {
+    GreedySolver.name: GreedySolver,
+    ImprovementSolver.name: ImprovementSolver,
+}
+
+def get_solver(solver=None) -> RouteSolver:
+    """Resolve a solver instance, a registered name, or None (DEFAULT_SOLVER)."""
+    if isinstance(solver, RouteSolver):
+        return solver
+    name = solver or DEFAULT_SOLVER
+    if name not in SOLVERS:
+        raise ValueError(f"Unknown route solver: {name!r}")
+    return SOLVERS[name]()
+
+def timed_items(schedule: List[List[Attraction]], start_date: str,
+                pinned: Set[int] = frozenset()) -> List[Dict[str, Any]]:
+    """Turn a day-by-day schedule into TripItem rows (without trip_id), each day starting at 9:00."""
+    rows = []
+    current_date = datetime.strptime(start_date, "%Y-%m-%d")
+    for day, day_items in enumerate(schedule, start=1):
+        t = datetime.combine(current_date, datetime.min.time()) + timedelta(hours=9)
+        for idx, a in enumerate(day_items, start=1):
+            st = t
+            et = t + timedelta(hours=a.duration_hours)
+            rows.append({"day": day, "order_index": idx, "attraction_id": a.id,
+                         "start_time": st.strftime("%H:%M"), "end_time": et.strftime("%H:%M"),
+                         "pinned": a.id in pinned})
+            t = et
+        current_date += timedelta(days=1)
+    return rows
+
+def compute_schedule(city: str, start_date: str, days: int, interests_csv: str, solver=None,
+                     use_cache: bool = True) -> List[Dict[str, Any]]:
+    """Plan a trip without touching the database beyond catalog reads.
+
+    Returns TripItem rows (day, order_index, attraction_id, start_time, end_time,
+    pinned) ready for ``save_items``. Schedules are memoized on (city, days, interests,
+    catalog version, solver) and only re-timed for ``start_date`` on a hit.
+    """
+    with metrics.timer("plan_itinerary"):
+        return _compute_schedule(city, start_date, days, interests_csv, solver, use_cache)
+
+def _normalize(city: str, interests_csv: str) -> Tuple[str, List[str]]:
+    return " ".join(city.split()), sorted({i.strip().lower() for i in interests_csv.split(',') if i.strip()})
+
+def _compute_schedule(city, start_date, days, interests_csv, solver, use_cache):
+    city, interests = _normalize(city, interests_csv)
+    route_solver = get_solver(solver)
+    version, attractions = catalog.city_snapshot(city)
+    key = (city, days, tuple(interests), version, route_solver.name)
+
+    cached = plan_cache.get(key) if use_cache else None
+    if cached is not None:
+        by_id = catalog.get_many(aid for day_ids in cached for aid in day_ids)
+        schedule = [[by_id[aid] for aid in day_ids] for day_ids in cached]
+        return timed_items(schedule, start_date)
+
+    candidates = filter_attractions(attractions, interests)
+    schedule = []
+    if candidates:
+        matrix = get_distance_matrix(city, attractions, version)
+        center = city_center(city, candidates)
+        schedule = route_solver.solve(matrix, candidates, center, days)
+    if use_cache:
+        plan_cache.set(key, [[a.id for a in day_items] for day_items in schedule])
+    return timed_items(schedule, start_date)
+
+def save_items(session, trip_id: int, rows: List[Dict[str, Any]], new_trip: bool = False):
+    """Bulk-insert TripItem rows for ``trip_id`` (one executemany); the caller commits.
+
+    The trip's revision is bumped unless ``new_trip`` says it was just created.
+    """
+    if rows:
+        session.execute(insert(TripItem), [dict(row, trip_id=trip_id) for row in rows])
+        if not new_trip:
+            bump_trip_revision(session.connection(), [trip_id])
+
+def create_planned_trip(session, name: str, city: str, start_date: str, days: int, interests_csv: str,
+                        user_id: int, budget: float = 0.0, solver=None, packing_list: bool = True) -> Trip:
+    """Plan and store a new trip atomically.
+
+    The schedule is computed before anything is written; the trip, all its
+    items and (with ``packing_list``) a suggested packing list based on the
+    trip length and the planned attractions' categories are then committed in
+    a single transaction, so a failure leaves no half-written trip behind.
+    """
+    rows = compute_schedule(city, start_date, days, interests_csv, solver=solver)
+    packing = []
+    if packing_list:
+        categories = {a.category for a in catalog.get_many(row["attraction_id"] for row in rows).values()}
+        packing = suggest_packing_items(days, categories)
+    trip = Trip(name=name, city=city, start_date=start_date, days=days, interests=interests_csv,
+                user_id=user_id, budget=budget)
     try:
-        attractions = session.query(Attraction).filter(Attraction.city == city).all()
-        interests = [i.strip().lower() for i in interests_csv.split(',') if i.strip()]
-        candidates = filter_attractions(attractions, interests)
-
-        # Greedy nearest-neighbor per day, respecting time budget
-        center = CITY_CENTERS.get(city, (candidates[0].lat, candidates[0].lon))
-        remaining = set(a.id for a in candidates)
-        current_date = datetime.strptime(start_date, "%Y-%m-%d")
-        for day in range(1, days+1):
-            day_hours = 0.0
-            day_items = []
-            cur_lat, cur_lon = center
-
-            while remaining:
-                # pick nearest remaining
-                nearest = None
-                nearest_dist = 1e9
-                for aid in list(remaining):
-                    a = next(x for x in candidates if x.id == aid)
-                    d = haversine(cur_lat, cur_lon, a.lat, a.lon)
-                    if d < nearest_dist and day_hours + a.duration_hours <= DAILY_HOURS:
-                        nearest, nearest_dist = a, d
-                if nearest is None:
-                    break
-                day_items.append(nearest)
-                remaining.remove(nearest.id)
-                cur_lat, cur_lon = nearest.lat, nearest.lon
-                day_hours += nearest.duration_hours
-
-            # save TripItems with naive times (start 9:00)
-            start_time = datetime.combine(current_date, datetime.min.time()) + timedelta(hours=9)
-            t = start_time
-            for idx, a in enumerate(day_items, start=1):
-                st = t
-                et = t + timedelta(hours=a.duration_hours)
-                session.add(TripItem(trip_id=trip_id, day=day, order_index=idx,
-                                     attraction_id=a.id,
-                                     start_time=st.strftime("%H:%M"),
-                                     end_time=et.strftime("%H:%M")))
-                t = et
-            session.commit()
-            current_date += timedelta(days=1)
+        session.add(trip)
+        session.flush()
+        save_items(session, trip.id, rows, new_trip=True)
+        if packing:
+            session.execute(insert(PackingItem), packing_rows(trip.id, packing))
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    return trip
 
+def plan_itinerary(city: str, start_date: str, days: int, interests_csv: str, trip_id: int, solver=None):
+    """Plan and store items for an existing trip in one transaction."""
+    rows = compute_schedule(city, start_date, days, interests_csv, solver=solver)
+    session = SessionLocal()
+    try:
+        save_items(session, trip_id, rows)
+        session.commit()
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+
+def replan_schedule(city: str, days: int, interests_csv: str, current: List[List[int]], pinned: Set[int],
+                    excluded: Set[int] = frozenset(), pin: Optional[Tuple[int, int]] = None, solver=None):
+    """Re-solve only the days of an existing schedule that an edit invalidates.
+
+    ``current`` holds the attraction ids of each existing day and ``pinned`` the
+    ids the traveller fixed in place. A day is re-solved when it is new, holds a
+    stop that is excluded or no longer matches the interests, or gains or loses
+    the ``pin`` ``(attraction_id, day)``; every other day is kept stop for stop.
+    Re-solved days keep their pinned stops and are topped up from candidates not
+    used elsewhere in the trip.
+
+    Returns ``(schedule, pinned, affected)``: attractions per day, the pinned ids
+    still in the trip, and the 1-based numbers of the re-solved days.
+    """
+    city, interests = _normalize(city, interests_csv)
+    route_solver = get_solver(solver)
+    version, attractions = catalog.city_snapshot(city)
+    by_id = {a.id: a for a in attractions}
+    pinned = set(pinned) - set(excluded)
+    pin_id = pin_day = None
+    if pin is not None:
+        pin_id, pin_day = pin
+        if pin_id not in by_id:
+            raise ValueError(f"Attraction {pin_id} is not in {city}")
+        if not 1 <= pin_day <= days:
+            raise ValueError(f"Cannot pin to day {pin_day} of a {days}-day trip")
+        pinned.add(pin_id)
+
+    candidates = [a for a in filter_attractions(attractions, interests) if a.id not in excluded]
+    eligible = {a.id for a in candidates} | pinned
+    day_ids = [list(current[d]) if d < len(current) else None for d in range(days)]
+    affected = set()
+    for d, ids in enumerate(day_ids):
+        if ids is None or any(aid not in eligible for aid in ids):
+            affected.add(d)
+        elif pin_id in ids and d != pin_day - 1:
+            affected.add(d)  # the pinned stop moves to another day
+    if pin_id is not None and pin_id not in (day_ids[pin_day - 1] or ()):
+        affected.add(pin_day - 1)
+
+    kept = {aid for d, ids in enumerate(day_ids) if d not in affected for aid in ids}
+    pool = [a for a in candidates if a.id not in kept and a.id not in pinned]
+    matrix = get_distance_matrix(city, attractions, version) if affected and attractions else None
+    center = city_center(city, attractions) if attractions else None
+
+    schedule = []
+    for d, ids in enumerate(day_ids):
+        if d not in affected:
+            schedule.append([by_id[aid] for aid in ids])
+            continue
+        fixed = [by_id[aid] for aid in (ids or ()) if aid in pinned and aid != pin_id]
+        if pin_day == d + 1:
+            fixed.append(by_id[pin_id])
+        fixed_hours = sum(a.duration_hours for a in fixed)
+        fill = greedy_days(matrix, pool, center, 1, DAILY_HOURS - fixed_hours)[0] if pool else []
+        taken = {a.id for a in fill}
+        pool = [a for a in pool if a.id not in taken]
+        stops = fixed + fill
+        # Pinned stops may overrun the day on their own; order them all rather than drop one.
+        day_items = route_solver.solve(matrix, stops, center, 1, max(DAILY_HOURS, fixed_hours))[0] if stops else []
+        schedule.append(day_items)
+
+    scheduled = {a.id for day_items in schedule for a in day_items}
+    return schedule, pinned & scheduled, {d + 1 for d in affected}
+
+def apply_item_diff(session, trip_id: int, old_items, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Write only the TripItem changes turning ``old_items`` into ``rows``; the caller commits.
+
+    Items are matched by (day, order_index): unchanged positions are left alone,
+    changed ones are updated in place, and the rest are inserted or deleted,
+    each kind as a single statement. The trip revision is bumped if anything
+    was written.
+    """
+    old = {(it.day, it.order_index): it for it in old_items}
+    inserts, updates = [], []
+    for row in rows:
+        it = old.pop((row["day"], row["order_index"]), None)
+        if it is None:
+            inserts.append(dict(row, trip_id=trip_id))
+        elif (it.attraction_id, it.start_time, it.end_time, it.pinned) != (
+                row["attraction_id"], row["start_time"], row["end_time"], row["pinned"]):
+            updates.append({"id": it.id, "attraction_id": row["attraction_id"], "start_time": row["start_time"],
+                            "end_time": row["end_time"], "pinned": row["pinned"]})
+    deletes = [it.id for it in old.values()]
+    if deletes:
+        session.execute(delete(TripItem).where(TripItem.id.in_(deletes)))
+    if updates:
+        session.execute(update(TripItem), updates)
+    if inserts:
+        session.execute(insert(TripItem), inserts)
+    if deletes or updates or inserts:
+        bump_trip_revision(session.connection(), [trip_id])
+    return {"inserted": len(inserts), "updated": len(updates), "deleted": len(deletes)}
+
+def replan_trip(session, trip: Trip, days: int = None, interests_csv: str = None, start_date: str = None,
+                pin: Optional[Tuple[int, int]] = None, remove: int = None, solver=None) -> Dict[str, Any]:
+    """Apply an edit to a stored trip, re-planning only the affected days.
+
+    Arguments left as None keep the trip's current value. ``pin`` fixes an
+    attraction to a day; ``remove`` drops one and keeps it out of later
+    re-plans. Start times do not depend on the date, so a new start date alone
+    writes no items. The trip and the item diff are committed together.
+    Returns the affected days and the number of rows inserted, updated and deleted.
+    """
+    days = trip.days if days is None else days
+    if days < 1:
+        raise ValueError("A trip needs at least one day")
+    interests_csv = trip.interests if interests_csv is None else interests_csv
+    start_date = trip.start_date if start_date is None else start_date
+    datetime.strptime(start_date, "%Y-%m-%d")  # reject malformed dates before writing anything
+
+    old_items = session.execute(
+        select(TripItem.id, TripItem.day, TripItem.order_index, TripItem.attraction_id,
+               TripItem.start_time, TripItem.end_time, TripItem.pinned)
+        .where(TripItem.trip_id == trip.id).order_by(TripItem.day, TripItem.order_index)).all()
+    current, pinned = [], set()
+    for it in old_items:
+        while len(current) < it.day:
+            current.append([])
+        current[it.day - 1].append(it.attraction_id)
+        if it.pinned:
+            pinned.add(it.attraction_id)
+
+    excluded = {int(x) for x in trip.excluded.split(",") if x}
+    if remove is not None:
+        if not any(remove in ids for ids in current):
+            raise ValueError(f"Attraction {remove} is not in this trip")
+        excluded.add(remove)
+    if pin is not None:
+        excluded.discard(pin[0])
+
+    with metrics.timer("replan_itinerary"):
+        schedule, pinned, affected = replan_schedule(trip.city, days, interests_csv, current, pinned,
+                                                     excluded, pin, solver)
+    rows = timed_items(schedule, start_date, pinned)
+    try:
+        stats = apply_item_diff(session, trip.id, old_items, rows)
+        trip.days = days
+        trip.interests = interests_csv
+        trip.start_date = start_date
+        trip.excluded = ",".join(str(x) for x in sorted(excluded))
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    stats["affected_days"] = sorted(affected)
+    return stats
+
+def load_itinerary(session, trip_id: int, user_id: int):
+    """Load a user's trip with its day-grouped items and packing list.
+
+    Items and their attractions come from one joined SELECT and packing items
+    from one more, however many days the trip has. Returns
+    ``(trip, days, packing_items)`` with ``days`` mapping day number to a list
+    of stop dicts, or ``(None, {}, [])`` if the trip does not exist.
+    """
+    # .all() rather than .first(): a LIMIT would cut the joined item rows short.
+    trips = (session.query(Trip)
+             .outerjoin(Trip.items).outerjoin(TripItem.attraction)
+             .options(contains_eager(Trip.items).contains_eager(TripItem.attraction),
+                      selectinload(Trip.packing_items))
+             .filter(Trip.id == trip_id, Trip.user_id == user_id)
+             .order_by(TripItem.day, TripItem.order_index)
+             .all())
+    if not trips:
+        return None, {}, []
+    trip = trips[0]
+    days = {}
+    for it in trip.items:
+        a = it.attraction
+        days.setdefault(it.day, []).append({
+            "name": a.name,
+            "lat": a.lat,
+            "lon": a.lon,
+            "start": it.start_time,
+            "end": it.end_time,
+            "category": a.category,
+            "duration": a.duration_hours,
+            "attraction_id": a.id,
+            "pinned": it.pinned,
+        })
+    return trip, days, trip.packing_items
+
@@ -0,0 +1,198 @@
+"""Opt-in request and SQL instrumentation with a Prometheus-style ``/metrics`` endpoint.
+
+Enable with ``TRIP_METRICS=1``. When disabled, ``init_app`` registers no hooks
+or engine listeners and ``timer()`` returns a shared no-op context manager, so
+the only cost left is one attribute check per timed block.
+
+Collected:
+- per-endpoint request latency histograms and request counts;
+- per-request SQL statement counts and SQL time (SQLAlchemy cursor events);
+- named operation timers (``plan_itinerary``, ``replan_itinerary``, ``plan_batch``, ``pdf_build``);
+- hit and miss counters of the caches passed to ``init_app``, read at scrape time;
+- a slow-request log, with the request's statements, above ``TRIP_SLOW_REQUEST_MS``.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+ENABLED = os.environ.get("TRIP_METRICS", "0") == "1"
+SLOW_REQUEST_MS = float(os.environ.get("TRIP_SLOW_REQUEST_MS", "500"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+log = logging.getLogger("trip.metrics")
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...]):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._series: Dict[Tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def expose(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(key, le=_fmt(bound))} {cumulative}"
+            yield f"{self.name}_bucket{_labels(key, le='+Inf')} {series[-1]}"
+            yield f"{self.name}_sum{_labels(key)} {_fmt(series[-2])}"
+            yield f"{self.name}_count{_labels(key)} {series[-1]}"
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def expose(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            snapshot = dict(self._values)
+        for key, value in sorted(snapshot.items()):
+            yield f"{self.name}{_labels(key)} {_fmt(value)}"
+
+class CacheStats:
+    """Hit and miss counters taken from each registered cache's ``stats()`` when scraped."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._sources: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+    def register(self, cache: str, stats: Callable[[], Dict[str, float]]):
+        self._sources[cache] = stats
+
+    def expose(self) -> Iterable[str]:
+        snapshot = {cache: stats() for cache, stats in sorted(self._sources.items())}
+        for field in ("hits", "misses"):
+            yield f"# HELP {self.name}_{field}_total In-process cache {field} by cache."
+            yield f"# TYPE {self.name}_{field}_total counter"
+            for cache, stats in snapshot.items():
+                yield f"{self.name}_{field}_total{_labels((('cache', cache),))} {_fmt(stats[field])}"
+
+def _fmt(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _labels(key, **extra) -> str:
+    items = list(key) + list(extra.items())
+    if not items:
+        return ""
+    escaped = (k + '="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+               for k, v in items)
+    return "{" + ",".join(escaped) + "}"
+
+request_duration = Histogram("trip_request_duration_seconds", "Request latency by endpoint.", LATENCY_BUCKETS)
+requests_total = Counter("trip_requests_total", "Requests by endpoint, method and status.")
+request_sql_statements = Histogram("trip_request_sql_statements", "SQL statements issued per request.", COUNT_BUCKETS)
+request_sql_duration = Histogram("trip_request_sql_duration_seconds", "Time spent in SQL per request.", LATENCY_BUCKETS)
+sql_statements_total = Counter("trip_sql_statements_total", "SQL statements, inside or outside requests.")
+operation_duration = Histogram("trip_operation_duration_seconds", "Timed internal operations.", LATENCY_BUCKETS)
+cache_stats = CacheStats("trip_cache")
+REGISTRY = [request_duration, requests_total, request_sql_statements, request_sql_duration,
+            sql_statements_total, operation_duration, cache_stats]
+
+_NULL_TIMER = nullcontext()
+
+def timer(operation: str):
+    """Context manager timing ``operation`` into trip_operation_duration_seconds."""
+    if not ENABLED:
+        return _NULL_TIMER
+    return _timed(operation)
+
+@contextmanager
+def _timed(operation: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        operation_duration.observe(time.perf_counter() - start, operation=operation)
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.expose()) + "\n"
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+    sql_statements_total.inc()
+    if has_request_context() and "metrics_queries" in g:
+        g.metrics_queries.append((elapsed, statement))
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start time here.
+    starts = context.connection.info.get("metrics_query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_queries = []
+
+def _after_request(response):
+    start = g.pop("metrics_start", None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    queries = g.pop("metrics_queries", [])
+    endpoint = request.endpoint or "unmatched"
+    request_duration.observe(elapsed, endpoint=endpoint, method=request.method)
+    requests_total.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    request_sql_statements.observe(len(queries), endpoint=endpoint)
+    request_sql_duration.observe(sum(q[0] for q in queries), endpoint=endpoint)
+    if elapsed * 1000 >= SLOW_REQUEST_MS:
+        log.warning("slow request %s %s: %.1f ms, %d SQL statements\n%s", request.method, request.path,
+                    elapsed * 1000, len(queries),
+                    "\n".join(f"  {q[0] * 1000:8.2f} ms  {q[1]}" for q in queries))
+    return response
+
+def init_app(app, engines, caches: Optional[Dict[str, Callable[[], Dict[str, float]]]] = None):
+    """Wire instrumentation into ``app`` and ``engines``, and export ``caches``, if TRIP_METRICS is enabled.
+
+    ``caches`` maps a cache name to its ``stats()`` method.
+    """
+    if not ENABLED:
+        return
+    for cache, stats in (caches or {}).items():
+        cache_stats.register(cache, stats)
+    for engine in {id(e): e for e in engines}.values():
+        if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+            continue  # already wired by an earlier create_app()
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule("/metrics", "metrics", lambda: Response(render(), mimetype="text/plain; version=0.0.4"))
@@ -0,0 +1,237 @@
+"""Versioned, in-place schema migrations for the SQLite database.
+
+``Base.metadata.create_all`` only creates missing tables; it never adds
+indexes, foreign keys or columns to tables that already exist. Each migration
+here upgrades an existing ``trip.db`` by one step and records its number in
+``PRAGMA user_version``. A brand-new database is created from the models and
+stamped with the latest version directly.
+
+Usage:
+    python migrations.py            # upgrade the configured database
+    python migrations.py --explain  # show query plans for the hot route queries
+"""
+import sys
+from typing import Callable, List, Tuple
+
+from sqlalchemy import inspect, select, tuple_
+
+from models import Base, engine, Attraction, PackingItem, Trip, TripItem
+
+# (version, description, function taking a raw sqlite3 connection)
+MIGRATIONS: List[Tuple[int, str, Callable]] = []
+
+def migration(version: int, description: str):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+def latest_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+@migration(1, "indexes for hot queries; trip_items/packing_items foreign keys with ON DELETE CASCADE")
+def _m0001_indexes_and_cascades(conn):
+    # SQLite cannot add a foreign key to an existing table, so rebuild both child tables.
+    # Orphans left behind by the old multi-statement delete would fail the FK check.
+    conn.execute("DELETE FROM trip_items WHERE trip_id NOT IN (SELECT id FROM trips)"
+                 " OR attraction_id NOT IN (SELECT id FROM attractions)")
+    conn.execute("""
+        CREATE TABLE trip_items_new (
+            id INTEGER NOT NULL,
+            trip_id INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            order_index INTEGER NOT NULL,
+            attraction_id INTEGER NOT NULL,
+            start_time VARCHAR(10) NOT NULL,
+            end_time VARCHAR(10) NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(trip_id) REFERENCES trips (id) ON DELETE CASCADE,
+            FOREIGN KEY(attraction_id) REFERENCES attractions (id)
+        )""")
+    conn.execute("INSERT INTO trip_items_new (id, trip_id, day, order_index, attraction_id, start_time, end_time)"
+                 " SELECT id, trip_id, day, order_index, attraction_id, start_time, end_time FROM trip_items")
+    conn.execute("DROP TABLE trip_items")
+    conn.execute("ALTER TABLE trip_items_new RENAME TO trip_items")
+
+    conn.execute("DELETE FROM packing_items WHERE trip_id NOT IN (SELECT id FROM trips)")
+    conn.execute("""
+        CREATE TABLE packing_items_new (
+            id INTEGER NOT NULL,
+            trip_id INTEGER NOT NULL,
+            item_name VARCHAR(120) NOT NULL,
+            is_packed BOOLEAN NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(trip_id) REFERENCES trips (id) ON DELETE CASCADE
+        )""")
+    conn.execute("INSERT INTO packing_items_new (id, trip_id, item_name, is_packed)"
+                 " SELECT id, trip_id, item_name, is_packed FROM packing_items")
+    conn.execute("DROP TABLE packing_items")
+    conn.execute("ALTER TABLE packing_items_new RENAME TO packing_items")
+
+    conn.execute("CREATE INDEX ix_trip_items_trip_day_order ON trip_items (trip_id, day, order_index)")
+    conn.execute("CREATE INDEX ix_packing_items_trip_id ON packing_items (trip_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_trips_user_id ON trips (user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_attractions_city ON attractions (city)")
+
+@migration(2, "trips (user_id, city) index for keyset-paginated trip listings")
+def _m0002_trips_user_city(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_trips_user_city ON trips (user_id, city)")
+
+@migration(3, "trip_items.pinned and trips.excluded for incremental trip edits")
+def _m0003_trip_edits(conn):
+    conn.execute("ALTER TABLE trip_items ADD COLUMN pinned BOOLEAN NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE trips ADD COLUMN excluded VARCHAR(400) NOT NULL DEFAULT ''")
+
+@migration(4, "unique (city, name) on attractions for importer upserts; city_centers table")
+def _m0004_attraction_upsert_key(conn):
+    # Keep the lowest id of any duplicate (city, name) and point trip items at it.
+    conn.execute("""
+        UPDATE trip_items SET attraction_id = (
+            SELECT MIN(b.id) FROM attractions a JOIN attractions b ON b.city = a.city AND b.name = a.name
+            WHERE a.id = trip_items.attraction_id)""")
+    removed = conn.execute("DELETE FROM attractions WHERE id NOT IN"
+                           " (SELECT MIN(id) FROM attractions GROUP BY city, name)").rowcount
+    conn.execute("CREATE UNIQUE INDEX ux_attractions_city_name ON attractions (city, name)")
+    conn.execute("""
+        CREATE TABLE city_centers (
+            city VARCHAR(40) NOT NULL,
+            lat FLOAT NOT NULL,
+            lon FLOAT NOT NULL,
+            attractions INTEGER NOT NULL,
+            PRIMARY KEY (city)
+        )""")
+    conn.execute("INSERT INTO city_centers (city, lat, lon, attractions)"
+                 " SELECT city, AVG(lat), AVG(lon), COUNT(*) FROM attractions GROUP BY city")
+    has_meta = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'catalog_meta'").fetchone()
+    if removed and has_meta:
+        conn.execute("UPDATE catalog_meta SET version = version + 1")
+
+@migration(5, "trips.revision and trips.updated_at for conditional itinerary requests")
+def _m0005_trip_revision(conn):
+    conn.execute("ALTER TABLE trips ADD COLUMN revision INTEGER NOT NULL DEFAULT 1")
+    conn.execute("ALTER TABLE trips ADD COLUMN updated_at DATETIME")
+
+@migration(6, "AUTOINCREMENT trip ids so a deleted trip's id is never handed to a new trip")
+def _m0006_trips_autoincrement(conn):
+    # Ids are baked into page caches, ETags and URLs; SQLite reuses the highest rowid
+    # after a delete unless the table is AUTOINCREMENT, which needs a rebuild.
+    conn.execute("""
+        CREATE TABLE trips_new (
+            id INTEGER NOT NULL,
+            name VARCHAR(80) NOT NULL,
+            city VARCHAR(40) NOT NULL,
+            start_date VARCHAR(20) NOT NULL,
+            days INTEGER NOT NULL,
+            interests VARCHAR(120) NOT NULL,
+            user_id INTEGER NOT NULL,
+            budget FLOAT,
+            excluded VARCHAR(400) DEFAULT '' NOT NULL,
+            revision INTEGER DEFAULT 1 NOT NULL,
+            updated_at DATETIME,
+            PRIMARY KEY (id AUTOINCREMENT),
+            FOREIGN KEY(user_id) REFERENCES users (id)
+        )""")
+    columns = "id, name, city, start_date, days, interests, user_id, budget, excluded, revision, updated_at"
+    conn.execute(f"INSERT INTO trips_new ({columns}) SELECT {columns} FROM trips")
+    conn.execute("DROP TABLE trips")
+    conn.execute("ALTER TABLE trips_new RENAME TO trips")
+    conn.execute("CREATE INDEX ix_trips_user_id ON trips (user_id)")
+    conn.execute("CREATE INDEX ix_trips_user_city ON trips (user_id, city)")
+
+@migration(7, "trips (user_id, start_date, id) index for the upcoming/past trip filter")
+def _m0007_trips_user_start_date(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_trips_user_start_date ON trips (user_id, start_date, id)")
+
+def upgrade(engine=engine) -> int:
+    """Bring the database up to ``latest_version()`` and return that version."""
+    if engine.dialect.name != "sqlite":
+        # Migrations are SQLite DDL; other backends get the current schema from the models.
+        Base.metadata.create_all(engine)
+        return latest_version()
+
+    if not inspect(engine).has_table(Trip.__tablename__):
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"PRAGMA user_version = {latest_version()}")
+        return latest_version()
+
+    raw = engine.raw_connection()
+    try:
+        conn = raw.driver_connection
+        isolation_level = conn.isolation_level
+        conn.isolation_level = None  # we issue BEGIN/COMMIT ourselves so DDL is transactional
+        conn.execute("PRAGMA foreign_keys = OFF")  # no-op inside a transaction, so set it first
+        try:
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+            for version, description, fn in MIGRATIONS:
+                if version <= current:
+                    continue
+                print(f"Applying migration {version}: {description}")
+                conn.execute("BEGIN")
+                try:
+                    fn(conn)
+                    violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+                    if violations:
+                        raise RuntimeError(f"migration {version} left foreign key violations: {violations[:5]}")
+                    conn.execute(f"PRAGMA user_version = {version}")
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+        finally:
+            conn.execute("PRAGMA foreign_keys = ON")
+            conn.isolation_level = isolation_level
+    finally:
+        raw.close()
+
+    # Tables introduced after the baseline schema are created straight from the models.
+    Base.metadata.create_all(engine)
+    return latest_version()
+
+def hot_queries():
+    """The route queries that must be served from an index, as (label, statement)."""
+    return [
+        ("itinerary items (view_trip, download_itinerary)",
+         select(TripItem).where(TripItem.trip_id == 1).order_by(TripItem.day, TripItem.order_index)),
+        ("packing list (view_trip)", select(PackingItem).where(PackingItem.trip_id == 1)),
+        ("trip list (trips)", select(Trip).where(Trip.user_id == 1).order_by(Trip.id.desc())),
+        ("trip list page (/api/trips)",
+         select(Trip.id, Trip.name).where(Trip.user_id == 1, Trip.id < 100).order_by(Trip.id.desc()).limit(20)),
+        ("trip list page by city (/api/trips?city=)",
+         select(Trip.id, Trip.name).where(Trip.user_id == 1, Trip.city == "Pune", Trip.id < 100)
+         .order_by(Trip.id.desc()).limit(20)),
+        ("upcoming trips page (/api/trips?when=upcoming)",
+         select(Trip.id).where(Trip.user_id == 1, Trip.start_date >= "2025-01-01",
+                               tuple_(Trip.start_date, Trip.id) > ("2025-03-01", 100))
+         .order_by(Trip.start_date, Trip.id).limit(20)),
+        ("past trips page (/api/trips?when=past)",
+         select(Trip.id).where(Trip.user_id == 1, Trip.start_date < "2025-01-01",
+                               tuple_(Trip.start_date, Trip.id) < ("2024-09-01", 100))
+         .order_by(Trip.start_date.desc(), Trip.id.desc()).limit(20)),
+        ("city catalog (plan_itinerary)", select(Attraction).where(Attraction.city == "Mumbai")),
+        ("attraction upsert key (importer)",
+         select(Attraction.id).where(Attraction.city == "Mumbai", Attraction.name == "Gateway of India")),
+        ("cascade from trips (delete_trip)", select(TripItem.id).where(TripItem.trip_id == 1)),
+    ]
+
+def explain(engine=engine):
+    """Print EXPLAIN QUERY PLAN for each hot query; return False if any does a full scan."""
+    ok = True
+    with engine.connect() as conn:
+        for label, stmt in hot_queries():
+            sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+            plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+            indexed = all("USING" in step for step in plan if step.startswith(("SCAN", "SEARCH")))
+            indexed = indexed and not any("TEMP B-TREE" in step for step in plan)
+            ok = ok and indexed
+            print(f"[{'ok' if indexed else 'SCAN'}] {label}")
+            for step in plan:
+                print(f"       {step}")
+    return ok
+
+if __name__ == "__main__":
+    version = upgrade()
+    print(f"Database schema at version {version}.")
+    if "--explain" in sys.argv[1:] and not explain():
+        sys.exit(1)
@@ -1,16 +1,57 @@
 from __future__ import annotations
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, ForeignKey, Boolean
+from sqlalchemy import create_engine, Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean, Index, event, text
+from sqlalchemy import delete, func, insert, select, true, update
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 from sqlalchemy.orm import Mapped, mapped_column
-import os
+from datetime import datetime, timezone
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from sqlalchemy.pool import StaticPool
+from config import DatabaseConfig
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "trip.db")
-engine = create_engine(f"sqlite:///{DB_PATH}", echo=False, future=True)
+db_config = DatabaseConfig()
+
+def create_db_engine(config: DatabaseConfig, url: str = None, read_only: bool = False):
+    """Build an engine for ``url`` (default ``config.url``) with the configured pool and pragmas."""
+    url = url or config.url
+    kwargs = {"echo": config.echo, "future": True}
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/") == "sqlite:"):
+        # An in-memory database lives in one connection; share it instead of pooling.
+        kwargs.update(poolclass=StaticPool, connect_args={"check_same_thread": False})
+    else:
+        kwargs.update(pool_size=config.pool_size, max_overflow=config.max_overflow,
+                      pool_timeout=config.pool_timeout, pool_recycle=config.pool_recycle,
+                      pool_pre_ping=not url.startswith("sqlite"))
+    new_engine = create_engine(url, **kwargs)
+
+    if new_engine.dialect.name == "sqlite":
+        pragmas = config.sqlite_pragmas(read_only=read_only)
+
+        @event.listens_for(new_engine, "connect")
+        def _apply_pragmas(dbapi_connection, connection_record):
+            # Pragmas are per connection (journal_mode is persisted in the file); SQLite
+            # also ignores FOREIGN KEY clauses and ON DELETE CASCADE unless asked here.
+            for pragma in pragmas:
+                dbapi_connection.execute(pragma)
+    return new_engine
+
+def _read_only_url(config: DatabaseConfig):
+    if config.read_url != "sqlite-ro":
+        return config.read_url
+    path = config.url.split(":///", 1)[1]
+    return f"sqlite:///file:{path}?mode=ro&uri=true"
+
+engine = create_db_engine(db_config)
+# GET routes may read through a separate engine (a replica, or the SQLite file opened read-only).
+read_engine = create_db_engine(db_config, _read_only_url(db_config), read_only=True) if db_config.read_url else engine
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False, future=True) if read_engine is not engine else SessionLocal
 Base = declarative_base()
 
+def utcnow() -> datetime:
+    """Current UTC time as a naive datetime, the form DateTime columns store."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class User(Base, UserMixin):
     __tablename__ = "users"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
@@ -30,22 +71,35 @@ class User(Base, UserMixin):
 
 class Trip(Base):
     __tablename__ = "trips"
+    # Keyset pages of a user's trips, optionally filtered by city, walk this index in id order.
+    # AUTOINCREMENT: ids of deleted trips are never reused, since caches and ETags are keyed on them.
+    __table_args__ = (Index("ix_trips_user_city", "user_id", "city"),
+                      Index("ix_trips_user_start_date", "user_id", "start_date", "id"),
+                      {"sqlite_autoincrement": True})
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(80))
     city: Mapped[str] = mapped_column(String(40))
     start_date: Mapped[str] = mapped_column(String(20))  # store as string for simplicity
     days: Mapped[int] = mapped_column(Integer)
     interests: Mapped[str] = mapped_column(String(120))  # comma separated
-    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"))
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), index=True)
     budget: Mapped[float] = mapped_column(Float, nullable=True, default=0.0)
+    excluded: Mapped[str] = mapped_column(String(400), default="", server_default="")  # attraction ids removed by edits, comma separated
+    # Bumped on every change to the trip, its items or its packing list; versions the itinerary page.
+    revision: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default=text("1"))
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=True, default=utcnow)  # naive UTC
 
     user: Mapped["User"] = relationship("User", back_populates="trips")
-    packing_items: Mapped[list["PackingItem"]] = relationship("PackingItem", back_populates="trip", cascade="all, delete-orphan")
+    # Children are removed by ON DELETE CASCADE in the database, not loaded and deleted one by one.
+    packing_items: Mapped[list["PackingItem"]] = relationship("PackingItem", back_populates="trip", cascade="all, delete-orphan",
+                                                              passive_deletes=True)
+    items: Mapped[list["TripItem"]] = relationship("TripItem", back_populates="trip", cascade="all, delete-orphan",
+                                                   passive_deletes=True, order_by="[TripItem.day, TripItem.order_index]")
 
 class PackingItem(Base):
     __tablename__ = "packing_items"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    trip_id: Mapped[int] = mapped_column(Integer, ForeignKey("trips.id"))
+    trip_id: Mapped[int] = mapped_column(Integer, ForeignKey("trips.id", ondelete="CASCADE"), index=True)
     item_name: Mapped[str] = mapped_column(String(120), nullable=False)
     is_packed: Mapped[bool] = mapped_column(Boolean, default=False)
 
@@ -53,8 +107,10 @@ class PackingItem(Base):
 
 class Attraction(Base):
     __tablename__ = "attractions"
+    # The importer upserts on (city, name).
+    __table_args__ = (Index("ux_attractions_city_name", "city", "name", unique=True),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    city: Mapped[str] = mapped_column(String(40))
+    city: Mapped[str] = mapped_column(String(40), index=True)
     name: Mapped[str] = mapped_column(String(120))
     category: Mapped[str] = mapped_column(String(40))    # one primary category
     duration_hours: Mapped[float] = mapped_column(Float) # typical time spent
@@ -64,10 +120,95 @@ class Attraction(Base):
 
 class TripItem(Base):
     __tablename__ = "trip_items"
+    __table_args__ = (Index("ix_trip_items_trip_day_order", "trip_id", "day", "order_index"),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    trip_id: Mapped[int] = mapped_column(Integer)
+    trip_id: Mapped[int] = mapped_column(Integer, ForeignKey("trips.id", ondelete="CASCADE"))
     day: Mapped[int] = mapped_column(Integer)
     order_index: Mapped[int] = mapped_column(Integer)
-    attraction_id: Mapped[int] = mapped_column(Integer)
+    attraction_id: Mapped[int] = mapped_column(Integer, ForeignKey("attractions.id"))
     start_time: Mapped[str] = mapped_column(String(10))
     end_time: Mapped[str] = mapped_column(String(10))
+    pinned: Mapped[bool] = mapped_column(Boolean, default=False, server_default=text("0"))  # kept in place by re-plans
+
+    trip: Mapped["Trip"] = relationship("Trip", back_populates="items")
+    attraction: Mapped["Attraction"] = relationship("Attraction", lazy="raise")
+
+class CatalogMeta(Base):
+    """Single-row table holding the attraction catalog version."""
+    __tablename__ = "catalog_meta"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+class CityCenter(Base):
+    """Mean position of a city's attractions, refreshed by the importer."""
+    __tablename__ = "city_centers"
+    city: Mapped[str] = mapped_column(String(40), primary_key=True)
+    lat: Mapped[float] = mapped_column(Float)
+    lon: Mapped[float] = mapped_column(Float)
+    attractions: Mapped[int] = mapped_column(Integer)
+
+# Number of committed catalog writes made by this process; lets caches notice
+# local changes immediately instead of waiting for their next version check.
+catalog_local_writes = 0
+
+def get_catalog_version(connection) -> int:
+    version = connection.execute(text("SELECT version FROM catalog_meta WHERE id = 1")).scalar()
+    return version or 0
+
+def bump_catalog_version(connection):
+    """Increment the catalog version; call after writing to ``attractions`` outside the ORM."""
+    result = connection.execute(text("UPDATE catalog_meta SET version = version + 1 WHERE id = 1"))
+    if result.rowcount == 0:
+        connection.execute(text("INSERT INTO catalog_meta (id, version) VALUES (1, 1)"))
+
+def bump_trip_revision(connection, trip_ids):
+    """Increment the revision of ``trip_ids``; call after writing their items or packing items outside the ORM."""
+    ids = sorted(set(trip_ids))
+    if ids:
+        connection.execute(update(Trip).where(Trip.id.in_(ids))
+                           .values(revision=Trip.revision + 1, updated_at=utcnow()))
+
+def refresh_city_centers(connection, cities=None):
+    """Recompute ``city_centers`` from ``attractions`` for ``cities`` (default: all of them)."""
+    def refresh(where):
+        centers = select(Attraction.city, func.avg(Attraction.lat), func.avg(Attraction.lon), func.count())
+        connection.execute(delete(CityCenter).where(where(CityCenter.city)))
+        connection.execute(insert(CityCenter).from_select(
+            ["city", "lat", "lon", "attractions"], centers.where(where(Attraction.city)).group_by(Attraction.city)))
+
+    if cities is None:
+        refresh(lambda column: true())
+        return
+    cities = sorted(set(cities))
+    for start in range(0, len(cities), 500):  # stay well under SQLite's bound-parameter limit
+        chunk = cities[start:start + 500]
+        refresh(lambda column: column.in_(chunk))
+
+@event.listens_for(SessionLocal, "after_flush")
+def _bump_catalog_on_flush(session, flush_context):
+    touched = session.new | session.dirty | session.deleted
+    if any(isinstance(obj, Attraction) for obj in touched):
+        bump_catalog_version(session.connection())
+        session.info["catalog_dirty"] = True
+
+@event.listens_for(SessionLocal, "after_flush")
+def _bump_trip_revision_on_flush(session, flush_context):
+    # Trips created in this flush already start at their first revision.
+    created = {obj.id for obj in session.new if isinstance(obj, Trip)}
+    trip_ids = {obj.trip_id for obj in session.new | session.deleted if isinstance(obj, (TripItem, PackingItem))}
+    for obj in session.dirty:
+        if isinstance(obj, (Trip, TripItem, PackingItem)) and session.is_modified(obj):
+            trip_ids.add(obj.id if isinstance(obj, Trip) else obj.trip_id)
+    trip_ids -= created | {None}
+    if trip_ids:
+        bump_trip_revision(session.connection(), trip_ids)
+
+@event.listens_for(SessionLocal, "after_commit")
+def _catalog_committed(session):
+    global catalog_local_writes
+    if session.info.pop("catalog_dirty", False):
+        catalog_local_writes += 1
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _catalog_rolled_back(session):
+    session.info.pop("catalog_dirty", None)
@@ -0,0 +1,124 @@
+"""Packing lists: suggested items for a trip and batched checklist edits."""
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, delete, insert, select, update
+
+from models import Attraction, PackingItem, Trip, TripItem, bump_trip_revision
+
+ESSENTIALS = ["ID / passport", "Phone charger", "Power bank", "Cash and cards", "Medicines", "Toiletries"]
+CATEGORY_ITEMS = {
+    "nature": ["Sunscreen", "Hat or cap", "Reusable water bottle", "Comfortable walking shoes"],
+    "history": ["Comfortable walking shoes", "Camera"],
+    "architecture": ["Camera"],
+    "temple": ["Scarf or shawl (covered shoulders)", "Socks for shoe-free areas"],
+    "religion": ["Scarf or shawl (covered shoulders)", "Modest clothing"],
+    "shopping": ["Foldable tote bag"],
+    "food": ["Antacids"],
+    "entertainment": ["Booking confirmations"],
+    "culture": ["Small change for guides and tips"],
+}
+
+def suggest_packing_items(days: int, categories: Iterable[str]) -> List[str]:
+    """Item names for a ``days``-long trip visiting attractions of ``categories``, without duplicates."""
+    days = max(1, days)
+    items = list(ESSENTIALS)
+    items += [f"T-shirts / tops x{min(days, 7)}", f"Underwear x{min(days + 1, 8)}", f"Socks x{min(days + 1, 8)}"]
+    if days >= 2:
+        items.append("Sleepwear")
+    if days >= 4:
+        items.append("Laundry bag")
+    if days >= 7:
+        items.append("Travel detergent")
+    for category in sorted({c.lower() for c in categories if c}):
+        items += CATEGORY_ITEMS.get(category, [])
+    return list(dict.fromkeys(items))
+
+def packing_rows(trip_id: int, names: Iterable[str], existing: Iterable[str] = ()) -> List[Dict[str, Any]]:
+    """PackingItem rows for ``names`` not already on the list (compared case-insensitively)."""
+    seen = {n.strip().lower() for n in existing}
+    rows = []
+    for name in names:
+        if name.strip().lower() not in seen:
+            seen.add(name.strip().lower())
+            rows.append({"trip_id": trip_id, "item_name": name, "is_packed": False})
+    return rows
+
+def add_suggested_items(session, trip: Trip) -> int:
+    """Add the suggested items a trip does not have yet in one bulk insert and commit; return how many.
+
+    Attraction categories and the current list come from one query each.
+    """
+    categories = session.scalars(select(Attraction.category).distinct()
+                                 .join(TripItem, TripItem.attraction_id == Attraction.id)
+                                 .where(TripItem.trip_id == trip.id))
+    existing = session.scalars(select(PackingItem.item_name).where(PackingItem.trip_id == trip.id))
+    rows = packing_rows(trip.id, suggest_packing_items(trip.days, categories), existing)
+    try:
+        if rows:
+            session.execute(insert(PackingItem), rows)
+            bump_trip_revision(session.connection(), [trip.id])
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    return len(rows)
+
+class PackingAccessError(Exception):
+    """The trip or one of the packing items does not belong to the user."""
+
+def apply_packing_changes(session, trip_id: int, user_id: int, toggle: Iterable[int] = (),
+                          packed: Optional[Dict[int, bool]] = None, add: Iterable[str] = (),
+                          remove: Iterable[int] = ()) -> Dict[str, Any]:
+    """Apply a batch of checklist edits to one trip in a single transaction.
+
+    ``toggle`` flips items, ``packed`` sets them explicitly (safe to resend;
+    values must be real booleans, else ValueError), ``add`` appends new
+    unpacked items and ``remove`` deletes items. Ownership
+    of the trip and of every referenced item is checked with one joined query
+    before anything is written; if any check fails nothing is changed and
+    PackingAccessError is raised. Writes are at most one UPDATE per target
+    state, one DELETE and one multi-row INSERT, plus the trip revision bump if
+    anything changed, then a single commit.
+    """
+    packed = {int(k): v for k, v in (packed or {}).items()}
+    if not all(isinstance(v, bool) for v in packed.values()):
+        raise ValueError("packed values must be true or false")
+    toggle, remove = {int(i) for i in toggle}, {int(i) for i in remove}
+    names = [n.strip() for n in add if n and n.strip()]
+    ids = toggle | remove | packed.keys()
+
+    rows = session.execute(
+        select(Trip.id, PackingItem.id, PackingItem.is_packed)
+        .outerjoin(PackingItem, and_(PackingItem.trip_id == Trip.id, PackingItem.id.in_(ids)))
+        .where(Trip.id == trip_id, Trip.user_id == user_id)).all()
+    if not rows:
+        raise PackingAccessError(f"Trip {trip_id} not found")
+    current = {item_id: is_packed for _, item_id, is_packed in rows if item_id is not None}
+    if ids - current.keys():
+        raise PackingAccessError(f"Packing items not on trip {trip_id}: {sorted(ids - current.keys())}")
+
+    state = {i: not current[i] for i in toggle}
+    state.update(packed)
+    for i in remove:
+        state.pop(i, None)
+    try:
+        written = False
+        for value in (True, False):
+            changed = [i for i, v in state.items() if v == value and current[i] != value]
+            if changed:
+                session.execute(update(PackingItem).where(PackingItem.id.in_(changed)).values(is_packed=value))
+                written = True
+        if remove:
+            session.execute(delete(PackingItem).where(PackingItem.id.in_(remove)))
+        added = []
+        if names:
+            added = session.execute(insert(PackingItem).returning(PackingItem.id, PackingItem.item_name),
+                                    [{"trip_id": trip_id, "item_name": n, "is_packed": False} for n in names]).all()
+        if written or remove or added:
+            bump_trip_revision(session.connection(), [trip_id])
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    return {"packed": {i: state[i] for i in sorted(state)}, "deleted": sorted(remove),
+            "added": [{"id": i, "item_name": n} for i, n in added]}
@@ -0,0 +1,85 @@
+"""Memoized trip schedules.
+
+A schedule depends only on the city, day count, interest set, catalog version
+and solver; the start date just shifts the calendar. Cached values are the
+attraction ids per day, which ``itinerary.compute_schedule`` re-times for the
+requested start date. Entries live in an in-process LRU and, when
+``TRIP_PLAN_CACHE_PATH`` is set, in a SQLite file shared across workers and
+restarts.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from caching import LRUCache
+
+PLAN_CACHE_SIZE = int(os.environ.get("TRIP_PLAN_CACHE_SIZE", "1024"))
+PLAN_CACHE_PATH = os.environ.get("TRIP_PLAN_CACHE_PATH", "")
+
+PlanKey = Tuple[str, int, Tuple[str, ...], int, str]  # city, days, interests, catalog version, solver
+
+class PlanCache:
+    def __init__(self, maxsize: int = PLAN_CACHE_SIZE, path: Optional[str] = PLAN_CACHE_PATH or None):
+        self.memory = LRUCache(maxsize=maxsize)
+        self.path = path
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._pruned_version = None
+        self.disk_hits = 0
+
+    def _disk(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS plan_cache ("
+                             " key TEXT PRIMARY KEY, catalog_version INTEGER NOT NULL,"
+                             " schedule TEXT NOT NULL, created_at REAL NOT NULL)")
+        return self._db
+
+    def get(self, key: PlanKey) -> Optional[List[List[int]]]:
+        schedule = self.memory.get(key)
+        if schedule is not None or not self.path:
+            return schedule
+        with self._db_lock:
+            row = self._disk().execute("SELECT schedule FROM plan_cache WHERE key = ?",
+                                       (json.dumps(key),)).fetchone()
+        if row is None:
+            return None
+        self.disk_hits += 1
+        schedule = json.loads(row[0])
+        self.memory.set(key, schedule)
+        return schedule
+
+    def set(self, key: PlanKey, schedule: List[List[int]]):
+        self.memory.set(key, schedule)
+        if not self.path:
+            return
+        version = key[3]
+        with self._db_lock:
+            db = self._disk()
+            if self._pruned_version != version:
+                # Plans for other catalog versions can never be hit again.
+                db.execute("DELETE FROM plan_cache WHERE catalog_version != ?", (version,))
+                self._pruned_version = version
+            db.execute("INSERT OR REPLACE INTO plan_cache (key, catalog_version, schedule, created_at)"
+                       " VALUES (?, ?, ?, ?)", (json.dumps(key), version, json.dumps(schedule), time.time()))
+
+    def clear(self):
+        self.memory.clear()
+        if self.path:
+            with self._db_lock:
+                self._disk().execute("DELETE FROM plan_cache")
+
+    def stats(self) -> Dict[str, float]:
+        stats = self.memory.stats()
+        # A disk hit was first counted as a memory miss.
+        hits = stats["hits"] + self.disk_hits
+        misses = stats["misses"] - self.disk_hits
+        stats.update(memory_hits=stats["hits"], disk_hits=self.disk_hits, hits=hits, misses=misses,
+                     hit_rate=hits / (hits + misses) if hits + misses else 0.0)
+        return stats
+
+plan_cache = PlanCache()
@@ -1,5 +1,6 @@
-from models import Base, engine, SessionLocal, Attraction
-from sqlalchemy import select
+from models import engine
+from importer import FIELDS, import_attractions
+from migrations import upgrade
 
 # Basic curated data (with image paths)
 SEED_ATTRACTIONS = [
@@ -51,21 +52,11 @@ SEED_ATTRACTIONS = [
     ("Nashik", "Sundarnarayan Temple", "temple", 1.0, 20.0000, 73.7800, "assets/nashik/sundarnarayan.jpg"),
 ]
 
-def seed():
-    Base.metadata.create_all(engine)
-    session = SessionLocal()
-
-    # Only seed once
-    existing = session.execute(select(Attraction)).first()
-    if existing:
-        session.close()
-        return
-
-    for city, name, cat, dur, lat, lon, img in SEED_ATTRACTIONS:
-        a = Attraction(city=city, name=name, category=cat, duration_hours=dur, lat=lat, lon=lon, image_path=img)
-        session.add(a)
-    session.commit()
-    session.close()
+def seed(engine=engine):
+    """Upsert the curated attractions; rows that are already stored unchanged are left alone."""
+    upgrade(engine)  # the upsert needs the current schema, as the old create_all did
+    rows = (dict(zip(FIELDS, values)) for values in SEED_ATTRACTIONS)
+    return import_attractions(enumerate(rows, start=1), engine)
 
 if __name__ == "__main__":
     seed()
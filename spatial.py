@@ -0,0 +1,167 @@
+"""In-memory spatial index over attraction coordinates.
+
+``GridIndex`` buckets points into a uniform grid of roughly ``cell_km``-sized
+cells and answers radius and k-nearest queries by searching rings of cells
+outward from the query point, so a query touches only the neighbourhood it
+needs rather than every point of the city. ``nearby`` serves the
+``/api/attractions/nearby`` endpoint from a per-city index that is rebuilt
+when the catalog version changes.
+"""
+import math
+import os
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from caching import LRUCache
+from catalog import catalog
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+GRID_CELL_KM = float(os.environ.get("TRIP_GRID_CELL_KM", "1.0"))
+INDEX_CACHE_CITIES = int(os.environ.get("TRIP_INDEX_CACHE_CITIES", "64"))
+
+def haversine_many(lat, lon, lats, lons):
+    """Vectorized haversine; all arguments in radians, broadcast like NumPy ufuncs."""
+    dphi = lats - lat
+    dlambda = lons - lon
+    a = np.sin(dphi/2)**2 + np.cos(lat)*np.cos(lats)*np.sin(dlambda/2)**2
+    return 2*EARTH_RADIUS_KM*np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))  # kilometers
+
+# A boolean mask over the indexed points, or a function taking an array of
+# point indices and returning which of them may be returned.
+Where = Union[np.ndarray, Callable[[np.ndarray], np.ndarray], None]
+
+class GridIndex:
+    """Uniform lat/lon grid over points given in degrees; results are point positions."""
+
+    def __init__(self, lats, lons, cell_km: float = GRID_CELL_KM):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.rad_lats = np.radians(self.lats)
+        self.rad_lons = np.radians(self.lons)
+        self.cell_km = cell_km
+        self.buckets: Dict[Tuple[int, int], np.ndarray] = {}
+        if not len(self.lats):
+            self.lat0 = self.lon0 = 0.0
+            self.dlat = self.dlon = 1.0
+            self.rows = self.cols = 0
+            return
+        # Longitude cells are sized at the most poleward point, so every cell is at least cell_km wide.
+        max_lat = min(float(np.abs(self.lats).max()), 89.0)
+        self.dlat = cell_km / KM_PER_DEGREE
+        self.dlon = cell_km / (KM_PER_DEGREE * math.cos(math.radians(max_lat)))
+        self.lat0, self.lon0 = float(self.lats.min()), float(self.lons.min())
+        r = ((self.lats - self.lat0) // self.dlat).astype(np.int64)
+        c = ((self.lons - self.lon0) // self.dlon).astype(np.int64)
+        self.rows, self.cols = int(r.max()) + 1, int(c.max()) + 1
+        keys = r * self.cols + c
+        order = np.argsort(keys, kind="stable")
+        bounds = np.flatnonzero(np.diff(keys[order])) + 1
+        for group in np.split(order, bounds):
+            k = int(keys[group[0]])
+            self.buckets[(k // self.cols, k % self.cols)] = group
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int((lat - self.lat0) // self.dlat), int((lon - self.lon0) // self.dlon)
+
+    def _ring(self, r0: int, c0: int, ring: int) -> List[np.ndarray]:
+        if ring == 0:
+            found = self.buckets.get((r0, c0))
+            return [found] if found is not None else []
+        cells = []
+        for r in (r0 - ring, r0 + ring):
+            if 0 <= r < self.rows:
+                for c in range(max(c0 - ring, 0), min(c0 + ring, self.cols - 1) + 1):
+                    cells.append(self.buckets.get((r, c)))
+        for c in (c0 - ring, c0 + ring):
+            if 0 <= c < self.cols:
+                for r in range(max(r0 - ring + 1, 0), min(r0 + ring - 1, self.rows - 1) + 1):
+                    cells.append(self.buckets.get((r, c)))
+        return [cell for cell in cells if cell is not None]
+
+    def search(self, lat: float, lon: float, k: Optional[int] = None, radius_km: Optional[float] = None,
+               where: Where = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Up to ``k`` points within ``radius_km`` of (lat, lon), nearest first: ``(positions, km)``.
+
+        Rings of cells are searched outward; after ring ``n`` every unseen point
+        is at least ``n * cell_km`` away, which bounds how far the search goes.
+        """
+        if k is None and radius_km is None:
+            raise ValueError("search needs k, radius_km or both")
+        empty = np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+        if not len(self) or k == 0:
+            return empty
+        qlat, qlon = math.radians(lat), math.radians(lon)
+        r0, c0 = self._cell(lat, lon)
+        last_ring = max(abs(r0), abs(r0 - self.rows + 1), abs(c0), abs(c0 - self.cols + 1))
+        found, dists = [], []
+        count = 0
+        kth = math.inf
+        for ring in range(last_ring + 1):
+            cells = self._ring(r0, c0, ring)
+            if cells:
+                idx = cells[0] if len(cells) == 1 else np.concatenate(cells)
+                if where is not None:
+                    idx = idx[where[idx] if isinstance(where, np.ndarray) else where(idx)]
+                if idx.size:
+                    d = haversine_many(qlat, qlon, self.rad_lats[idx], self.rad_lons[idx])
+                    if radius_km is not None:
+                        keep = d <= radius_km
+                        idx, d = idx[keep], d[keep]
+                    found.append(idx)
+                    dists.append(d)
+                    count += idx.size
+                    if k is not None and count >= k:
+                        kth = np.partition(np.concatenate(dists), k - 1)[k - 1]
+            bound = ring * self.cell_km
+            if kth <= bound or (radius_km is not None and radius_km <= bound):
+                break
+        if not count:
+            return empty
+        idx, d = np.concatenate(found), np.concatenate(dists)
+        order = np.argsort(d, kind="stable")
+        if k is not None:
+            order = order[:k]
+        return idx[order], d[order]
+
+    def nearest(self, lat: float, lon: float, where: Where = None) -> Optional[int]:
+        """Position of the single nearest point allowed by ``where``, or None."""
+        idx, _ = self.search(lat, lon, k=1, where=where)
+        return int(idx[0]) if idx.size else None
+
+_indexes = LRUCache(maxsize=INDEX_CACHE_CITIES)  # city -> (catalog version, GridIndex, records, categories)
+
+def city_index(city: str):
+    """``(GridIndex, records, categories)`` for a city, all in the same point order.
+
+    Cached for the ``INDEX_CACHE_CITIES`` most recently used cities and rebuilt
+    when the catalog version changes. Returns None, and caches nothing, for a
+    city without attractions.
+    """
+    version, records = catalog.city_snapshot(city)
+    if not records:
+        return None
+    entry = _indexes.get(city)
+    if entry is not None and entry[0] == version:
+        return entry[1:]
+    index = GridIndex([a.lat for a in records], [a.lon for a in records])
+    categories = np.array([a.category.lower() for a in records], dtype=object)
+    _indexes.set(city, (version, index, records, categories))
+    return index, records, categories
+
+def nearby(city: str, lat: float, lon: float, radius_km: float, k: int, categories=None) -> List[tuple]:
+    """Attractions of ``city`` within ``radius_km`` of (lat, lon), nearest first, as ``(record, km)``."""
+    entry = city_index(city)
+    if entry is None:
+        return []
+    index, records, point_categories = entry
+    where = None
+    if categories:
+        wanted = [c.lower() for c in categories]
+        where = lambda idx: np.isin(point_categories[idx], wanted)  # only the cells actually searched
+    idx, dists = index.search(lat, lon, k=k, radius_km=radius_km, where=where)
+    return [(records[i], float(d)) for i, d in zip(idx, dists)]
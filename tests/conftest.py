@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# The engine is built when ``models`` is imported, so point it at a scratch
+# database (and keep PDF exports out of the checkout) before any test imports the app.
+_scratch = tempfile.mkdtemp(prefix="trip-tests-")
+os.environ["TRIP_DB_PATH"] = os.path.join(_scratch, "trip.db")
+os.environ["TRIP_EXPORT_CACHE_DIR"] = os.path.join(_scratch, "export_cache")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
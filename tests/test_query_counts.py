@@ -0,0 +1,33 @@
+"""The itinerary routes issue a fixed number of SQL statements, however long the trip."""
+import pytest
+from jinja2 import DictLoader
+
+from app import create_app
+from benchmarks.check_queries import MAX_STATEMENTS, ROUTES, statement_counts
+from migrations import upgrade
+from seed_data import seed
+
+# Stand-ins for the HTML templates that touch everything the views hand them,
+# so a lazy load anywhere in a page would show up as extra statements.
+TEMPLATES = {f"{name}.html": name for name in ("index", "about", "signup", "login", "trips", "create_trip")}
+TEMPLATES["itinerary.html"] = """
+{{ trip.name }} {{ trip.city }} {{ trip.start_date }} {{ trip.days }} {{ trip.budget }}
+{% for day, stops in days.items() %}{{ day }}:{% for s in stops %} {{ s.name }} {{ s.start }}-{{ s.end }}{% endfor %}
+{% endfor %}
+{% for item in packing_items %}{{ item.item_name }} {{ item.is_packed }}{% endfor %}
+{{ total_estimated_cost }} {{ budget_remaining }}
+"""
+
+@pytest.fixture(scope="module")
+def counts():
+    upgrade()
+    seed()
+    app = create_app({"TESTING": True})
+    app.jinja_env.loader = DictLoader(TEMPLATES)
+    return statement_counts(app)
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_statement_count_does_not_grow_with_trip_length(counts, route):
+    short_trip, long_trip = counts[route]
+    assert short_trip == long_trip
+    assert long_trip <= MAX_STATEMENTS